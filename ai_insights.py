@@ -0,0 +1,235 @@
+import contextvars
+import hashlib
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from instrumentation import span
+from llm_cache import make_key
+from llm_digest import QA_TOKEN_BUDGET, SUMMARY_TOKEN_BUDGET, build_digest, estimate_tokens
+
+# Model and prompts used for the AI-generated insights
+MODEL = "gpt-4o"
+SUMMARY_SYSTEM_PROMPT = "You are an economic analyst providing concise summaries of data trends."
+QA_SYSTEM_PROMPT = "You are an economic analyst answering questions based on provided data."
+TEMPERATURE = 0.7
+SUMMARY_MAX_TOKENS = 250
+QA_MAX_TOKENS = 300
+
+# Maximum number of summary requests in flight at once
+MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+
+# Process-wide OpenAI client, created on first use
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide OpenAI client, importing the openai package and
+    creating the client on first use. OPENAI_BASE_URL can point it at a
+    compatible server such as mock_openai_server.py.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"))
+        return _client
+
+
+def data_hash(data):
+    """
+    Hash the index and values of a DataFrame.
+    """
+    return hashlib.sha256(pd.util.hash_pandas_object(data, index=True).values.tobytes()).hexdigest()
+
+
+def summary_prompt(name, data, start_date, end_date):
+    """
+    Build the user prompt asking for a summary of one indicator. The data is
+    sent as a bounded-size statistical digest rather than raw CSV, so the
+    prompt size does not grow with the date range.
+    """
+    data_snippet = build_digest({name: data}, SUMMARY_TOKEN_BUDGET)
+    return (
+        f"Provide a concise 5-sentence analysis of trends in {name} for the period {start_date} to {end_date}, "
+        f"highlighting major trends, key events, and recent changes. Data (statistical digest of the quarterly series):\n{data_snippet}"
+    )
+
+
+def qa_prompt(question, all_data, start_date, end_date):
+    """
+    Build the user prompt answering a question about all selected indicators,
+    using a digest of every series and their correlations.
+    """
+    all_data_snippet = build_digest(all_data, QA_TOKEN_BUDGET)
+    return (
+        f"Answer the following question using the provided macroeconomic data for the range {start_date} to {end_date} in 8 or less sentences:\n"
+        f"{question}\n\nData (statistical digest of the quarterly series):\n{all_data_snippet}"
+    )
+
+
+class GenerationCancelled(Exception):
+    """
+    Raised inside a streaming call once its cancel event is set.
+    """
+
+
+def stream_completion(client, system_prompt, prompt, max_tokens, cancel_event=None):
+    """
+    Stream a chat completion, yielding text fragments as they arrive. The
+    HTTP stream is closed as soon as the cancel event is set or the consumer
+    stops iterating.
+
+    The call is recorded as an "llm.completion" span with its token usage,
+    estimated from the text when the server does not report it.
+    """
+    with span("llm.completion", model=MODEL, max_tokens=max_tokens) as current_span:
+        stream = client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=TEMPERATURE,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        try:
+            for chunk in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    current_span.status = "cancelled"
+                    raise GenerationCancelled("Generation was cancelled.")
+                if chunk.usage is not None:
+                    current_span.set(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+            if "prompt_tokens" not in current_span.attributes:
+                current_span.set(
+                    prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(prompt),
+                    completion_tokens=estimate_tokens("".join(parts)),
+                    tokens_estimated=True,
+                )
+
+
+def summary_cache_key(name, data, start_date, end_date, prompt):
+    """
+    Cache key of a summary: indicator, date range, data, model and prompt.
+    """
+    return make_key(
+        indicator=name,
+        start_date=start_date,
+        end_date=end_date,
+        data_hash=data_hash(data),
+        model=MODEL,
+        system_prompt=SUMMARY_SYSTEM_PROMPT,
+        prompt=prompt,
+        temperature=TEMPERATURE,
+        max_tokens=SUMMARY_MAX_TOKENS,
+    )
+
+
+def stream_summaries(client, all_data, start_date, end_date, cache=None, refresh=False,
+                     max_concurrency=MAX_CONCURRENCY, cancel_event=None):
+    """
+    Summarize every non-empty indicator concurrently, with at most
+    `max_concurrency` requests in flight.
+
+    Yields (name, kind, text) events in arrival order: "chunk" events carry
+    streamed fragments, then each indicator ends with a "done" event holding
+    its full summary or an "error" event holding the error message. Cached
+    summaries are returned as a single "done" event. Closing the generator
+    early cancels the requests still running.
+    """
+    cancel_event = cancel_event or threading.Event()
+    events = queue.Queue()
+    pending = {name: data for name, data in all_data.items() if not data.empty}
+
+    def summarize(name, data):
+        with span("llm.summary", indicator=name) as current_span:
+            summarize_one(name, data, current_span)
+
+    def summarize_one(name, data, current_span):
+        prompt = summary_prompt(name, data, start_date, end_date)
+        current_span.set(cached=True)
+
+        def compute():
+            current_span.set(cached=False)
+            parts = []
+            for fragment in stream_completion(client, SUMMARY_SYSTEM_PROMPT, prompt, SUMMARY_MAX_TOKENS, cancel_event):
+                parts.append(fragment)
+                events.put((name, "chunk", fragment))
+            return "".join(parts).strip()
+
+        try:
+            if cache is None:
+                summary = compute()
+            else:
+                key = summary_cache_key(name, data, start_date, end_date, prompt)
+                try:
+                    summary = cache.get_or_compute(key, compute, refresh=refresh)
+                except GenerationCancelled:
+                    # Another session cancelled the request this one was waiting on
+                    if cancel_event.is_set():
+                        raise
+                    summary = cache.get_or_compute(key, compute, refresh=refresh)
+            events.put((name, "done", summary))
+        except Exception as e:
+            current_span.status = "cancelled" if isinstance(e, GenerationCancelled) else "error"
+            events.put((name, "error", str(e)))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+    remaining = len(pending)
+    try:
+        for name, data in pending.items():
+            # Run in a copy of the caller's context so the spans reach its collectors
+            executor.submit(contextvars.copy_context().run, summarize, name, data)
+        while remaining:
+            event = events.get()
+            if event[1] != "chunk":
+                remaining -= 1
+            yield event
+    finally:
+        if remaining:
+            cancel_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def generate_summary(client, all_data, start_date, end_date, cache=None, refresh=False, max_concurrency=MAX_CONCURRENCY):
+    """
+    Summarize every non-empty indicator concurrently and join the results in
+    indicator order, reporting errors inline.
+    """
+    results = {}
+    for name, kind, text in stream_summaries(
+        client, all_data, start_date, end_date, cache=cache, refresh=refresh, max_concurrency=max_concurrency
+    ):
+        if kind == "done":
+            results[name] = f"**{name}:** {text}"
+        elif kind == "error":
+            results[name] = f"**{name}:** An error occurred while generating the summary: {text}"
+    return "\n\n".join(results[name] for name in all_data if name in results)
+
+
+def stream_answer(client, question, all_data, start_date, end_date, cancel_event=None):
+    """
+    Answer a question about the selected indicators, yielding the answer as
+    it is generated.
+    """
+    yield from stream_completion(
+        client, QA_SYSTEM_PROMPT, qa_prompt(question, all_data, start_date, end_date), QA_MAX_TOKENS, cancel_event
+    )
+
+
+def answer_question(client, question, all_data, start_date, end_date):
+    """
+    Answer a question about the selected indicators.
+    """
+    return "".join(stream_answer(client, question, all_data, start_date, end_date)).strip()
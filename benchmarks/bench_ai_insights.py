@@ -0,0 +1,137 @@
+"""
+Latency benchmark of the AI Insights tab against the local OpenAI stand-in.
+
+Runs N concurrent sessions, each generating the summaries for the selected
+indicators and then answering one question, and reports p50/p95 latencies
+and the number of requests the server received. Run from the repository root:
+
+    python -m benchmarks.bench_ai_insights --sessions 1 4 16
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from openai import OpenAI
+from ai_insights import MAX_CONCURRENCY, stream_answer, stream_summaries
+from llm_cache import SummaryCache
+from mock_openai_server import MockOpenAIServer, MockSettings
+from pyramid import resample_range
+from registry import load_registry
+
+QUESTION = "How did the policy rate respond to inflation over this period?"
+
+
+def load_quarterly_data(start_date, end_date, data_dir="cleaned_data/"):
+    """
+    Prepare the quarterly data the AI Insights tab sends, for every indicator.
+    """
+    all_data = {}
+    for name, indicator in load_registry().items():
+        file_path = os.path.join(data_dir, indicator.cleaned_file)
+        all_data[name] = resample_range(file_path, "quarterly", start_date, end_date, indicator.aggregation)
+    return all_data
+
+
+def run_session(client, all_data, start_date, end_date, cache, max_concurrency):
+    """
+    Time one session: the summaries (first fragment and completion) and the
+    Q&A answer (first token and completion).
+    """
+    timings = {}
+    start = time.perf_counter()
+    errors = 0
+    for _, kind, _ in stream_summaries(client, all_data, start_date, end_date, cache=cache, max_concurrency=max_concurrency):
+        timings.setdefault("summary_first", time.perf_counter() - start)
+        errors += kind == "error"
+    timings["summary_total"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        for _ in stream_answer(client, QUESTION, all_data, start_date, end_date):
+            timings.setdefault("qa_first", time.perf_counter() - start)
+    except Exception:
+        errors += 1
+    timings["qa_total"] = time.perf_counter() - start
+    timings["errors"] = errors
+    return timings
+
+
+def run_benchmark(sessions, settings, use_cache=False, max_concurrency=MAX_CONCURRENCY,
+                  start_date="1947-01-01", end_date="2024-07-01"):
+    """
+    Run `sessions` concurrent sessions against a fresh stand-in server and
+    return latency percentiles and server request counts.
+    """
+    all_data = load_quarterly_data(start_date, end_date)
+    results = []
+    lock = threading.Lock()
+
+    with MockOpenAIServer(settings) as server, tempfile.TemporaryDirectory() as cache_dir:
+        client = OpenAI(api_key="mock", base_url=server.base_url)
+        cache = SummaryCache(os.path.join(cache_dir, "summaries.sqlite")) if use_cache else None
+        barrier = threading.Barrier(sessions)
+
+        def session():
+            barrier.wait()
+            timings = run_session(client, all_data, start_date, end_date, cache, max_concurrency)
+            with lock:
+                results.append(timings)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=session) for _ in range(sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        server_stats = server.stats.snapshot()
+
+    report = {"sessions": sessions, "cache": use_cache, "wall_seconds": round(wall, 3), "server": server_stats}
+    for metric in ("summary_first", "summary_total", "qa_first", "qa_total"):
+        values = [r[metric] for r in results if metric in r]
+        if values:
+            report[metric] = {
+                "p50": round(float(np.percentile(values, 50)), 3),
+                "p95": round(float(np.percentile(values, 95)), 3),
+            }
+    report["errors"] = sum(r["errors"] for r in results)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI Insights summary and Q&A paths.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="Concurrent session counts to run.")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--cache", action="store_true", help="Share a fresh summary cache between the sessions.")
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON lines.")
+    args = parser.parse_args()
+
+    for sessions in args.sessions:
+        settings = MockSettings(
+            latency=args.latency,
+            tokens_per_second=args.tokens_per_second,
+            response_tokens=args.response_tokens,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            seed=0,
+        )
+        report = run_benchmark(sessions, settings, use_cache=args.cache, max_concurrency=args.max_concurrency)
+        if args.json:
+            print(json.dumps(report))
+            continue
+        print(f"{sessions} session(s): wall {report['wall_seconds']}s, "
+              f"{report['server']['requests']} requests {report['server']['by_status']}, {report['errors']} errors")
+        for metric in ("summary_first", "summary_total", "qa_first", "qa_total"):
+            if metric in report:
+                print(f"  {metric:<14} p50 {report[metric]['p50']:.3f}s  p95 {report[metric]['p95']:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Time and peak-memory benchmark of the data pipeline and the dashboard's
+per-tab data preparation, on synthetic FMP-shaped data at a configurable
+scale. Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --indicators 12 --years 100 --record --check
+
+--record appends the results, tagged with the current commit, to
+.benchmarks/pipeline_history.jsonl. --check compares them with the latest
+recorded run of the same scale from another commit (or --baseline COMMIT)
+and exits with status 1 when a case got slower or uses more memory than
+the thresholds allow.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import pandas as pd
+from ai_insights import summary_prompt
+from charts import clear_figure_cache, comparison_data
+from clean_data import clean_csv, clean_csv_streaming
+from correlation_engine import load_correlation_index
+from data_loader import clear_cache
+from downsample import MAX_CHART_POINTS, load_downsampler
+from llm_digest import QA_TOKEN_BUDGET, build_digest
+from merge_cleaned_files import merge_cleaned_files, resample_to_monthly
+from pyramid import build_pyramid, resample_range
+from range_stats import load_range_stats
+from benchmarks.synthetic_data import END_DATE, generate_dataset
+
+HISTORY_PATH = ".benchmarks/pipeline_history.jsonl"
+
+# A case regresses when it is this much slower (or uses this much more peak
+# memory) than the baseline, and by more than the absolute noise floor.
+# Timings of the same commit vary by up to ~40% on shared machines; peak
+# memory is deterministic.
+TIME_THRESHOLD = 0.5
+MEMORY_THRESHOLD = 0.25
+MIN_TIME_DELTA = 0.010
+MIN_MEMORY_DELTA_MB = 1.0
+
+# Indicators selected in the dashboard's multi-indicator views
+SELECTED_INDICATORS = 4
+
+
+def run_case(prepare, repeat):
+    """
+    Time `repeat` runs of the function returned by prepare() (called before
+    every run, untimed) and measure the peak traced memory of one more run.
+    Returns the best time in seconds and the peak in MB.
+    """
+    times = []
+    for _ in range(repeat):
+        fn = prepare()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    fn = prepare()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak / 2**20
+
+
+class Workspace:
+    """
+    A synthetic dataset on disk: raw files, their cleaned versions and the
+    merged table, plus the dashboard selections the tab cases use.
+    """
+
+    def __init__(self, root, indicators, years, frequencies, seed=0):
+        self.raw_dir = os.path.join(root, "data")
+        self.cleaned_dir = os.path.join(root, "cleaned_data")
+        os.makedirs(self.cleaned_dir, exist_ok=True)
+        self.dataset = generate_dataset(self.raw_dir, indicators, years, frequencies, seed)
+        self.cleaned = {name: f"cleaned_{filename}" for name, (filename, _) in self.dataset.items()}
+        self.merged_path = os.path.join(self.cleaned_dir, "merged_indicators.csv")
+
+        # The largest series is charted in the time series tab
+        self.selected = list(self.dataset)[:SELECTED_INDICATORS]
+        self.charted = max(self.dataset, key=lambda name: os.path.getsize(self.raw_path(name)))
+        self.start_date = f"{int(END_DATE[:4]) - years}-01-01"
+        self.end_date = END_DATE
+
+    def raw_path(self, name):
+        return os.path.join(self.raw_dir, self.dataset[name][0])
+
+    def cleaned_path(self, name):
+        return os.path.join(self.cleaned_dir, self.cleaned[name])
+
+    def clean_all(self, streaming=False):
+        clean = clean_csv_streaming if streaming else clean_csv
+        for name in self.dataset:
+            clean(self.raw_path(name), self.cleaned_path(name))
+
+    def merge(self):
+        merge_cleaned_files(self.cleaned, self.cleaned_dir, self.merged_path)
+
+    def build_pyramids(self):
+        for name, (_, frequency) in self.dataset.items():
+            build_pyramid(self.cleaned_path(name), frequency)
+
+
+def tab_cases(ws):
+    """
+    The data preparation each dashboard tab runs for its default view.
+    """
+    def time_series():
+        load_downsampler(ws.cleaned_path(ws.charted)).query(ws.start_date, ws.end_date, MAX_CHART_POINTS)
+
+    def key_statistics():
+        for name in ws.selected:
+            load_range_stats(ws.cleaned_path(name)).query(ws.start_date, ws.end_date)
+
+    def visualizations():
+        index = load_correlation_index(ws.merged_path)
+        index.corr(ws.start_date, ws.end_date, columns=ws.selected)
+        first, second = ws.selected[:2]
+        comparison_data(ws.cleaned_path(first), ws.cleaned_path(second), first, second, ws.start_date, ws.end_date)
+        index.rolling(first, second, 36, start=ws.start_date, end=ws.end_date)
+
+    def ai_insights():
+        all_data = {
+            name: resample_range(ws.cleaned_path(name), "quarterly", ws.start_date, ws.end_date)
+            for name in ws.selected
+        }
+        for name, data in all_data.items():
+            summary_prompt(name, data, ws.start_date, ws.end_date)
+        build_digest(all_data, QA_TOKEN_BUDGET)
+
+    return {"tab1_time_series": time_series, "tab2_statistics": key_statistics,
+            "tab3_visualizations": visualizations, "tab4_ai_prompts": ai_insights}
+
+
+def run_benchmarks(indicators=12, years=100, frequencies=("daily", "monthly", "quarterly"), repeat=5, seed=0):
+    """
+    Build a synthetic workspace and return {case: {"seconds", "peak_mb"}}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as root, contextlib.redirect_stdout(io.StringIO()):
+        ws = Workspace(root, indicators, years, frequencies, seed)
+
+        results["clean_csv_streaming"] = run_case(lambda: (lambda: ws.clean_all(streaming=True)), repeat)
+        results["clean_csv"] = run_case(lambda: ws.clean_all, repeat)
+        results["merge_cleaned_files"] = run_case(lambda: ws.merge, repeat)
+        results["build_pyramid"] = run_case(lambda: ws.build_pyramids, repeat)
+
+        raw = pd.read_csv(ws.cleaned_path(ws.charted))
+        results["resample_to_monthly"] = run_case(lambda: (lambda df=raw.copy(): resample_to_monthly(df)), repeat)
+
+        def cold(fn):
+            # Empty the process-wide caches, as after a restart or a data refresh
+            def prepare():
+                clear_cache()
+                clear_figure_cache()
+                return fn
+            return prepare
+
+        for case, fn in tab_cases(ws).items():
+            results[f"{case}_cold"] = run_case(cold(fn), repeat)
+            results[f"{case}_warm"] = run_case(lambda: fn, repeat)
+        clear_cache()
+        clear_figure_cache()
+
+    return {case: {"seconds": round(seconds, 5), "peak_mb": round(peak, 2)} for case, (seconds, peak) in results.items()}
+
+
+def current_commit():
+    """
+    Return the short hash of HEAD, suffixed with -dirty for uncommitted changes.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(history, scale, commit, baseline=None):
+    """
+    Return the latest recorded run of the same scale, either from the given
+    baseline commit or from any commit other than the current one.
+    """
+    for record in reversed(history):
+        if record["scale"] != scale:
+            continue
+        if baseline is not None and record["commit"].startswith(baseline):
+            return record
+        if baseline is None and record["commit"] != commit:
+            return record
+    return None
+
+
+def regressions(results, baseline_results, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """
+    Return a message for every case over the time or memory threshold.
+    """
+    messages = []
+    for case, current in results.items():
+        previous = baseline_results.get(case)
+        if previous is None:
+            continue
+        slower = current["seconds"] - previous["seconds"]
+        if slower > MIN_TIME_DELTA and current["seconds"] > previous["seconds"] * (1 + time_threshold):
+            messages.append(f"{case}: {previous['seconds']:.4f}s -> {current['seconds']:.4f}s")
+        larger = current["peak_mb"] - previous["peak_mb"]
+        if larger > MIN_MEMORY_DELTA_MB and current["peak_mb"] > previous["peak_mb"] * (1 + memory_threshold):
+            messages.append(f"{case}: peak {previous['peak_mb']:.1f} MB -> {current['peak_mb']:.1f} MB")
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline and dashboard data preparation on synthetic data.")
+    parser.add_argument("--indicators", type=int, default=12)
+    parser.add_argument("--years", type=int, default=100)
+    parser.add_argument("--frequencies", nargs="+", choices=["daily", "monthly", "quarterly"], default=["daily", "monthly", "quarterly"])
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case; the best one is kept.")
+    parser.add_argument("--record", action="store_true", help="Append the results to the history file.")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions against the baseline run.")
+    parser.add_argument("--baseline", help="Commit to compare with (default: latest run from another commit).")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD, help="Allowed relative slowdown.")
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD, help="Allowed relative peak memory growth.")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    scale = {"indicators": args.indicators, "years": args.years, "frequencies": args.frequencies}
+    results = run_benchmarks(args.indicators, args.years, tuple(args.frequencies), args.repeat)
+    commit = current_commit()
+    baseline = find_baseline(load_history(args.history), scale, commit, args.baseline)
+
+    if args.json:
+        print(json.dumps({"commit": commit, "scale": scale, "results": results}))
+    else:
+        print(f"{args.indicators} indicators, {args.years} years ({', '.join(args.frequencies)}), commit {commit}")
+        if baseline is not None:
+            print(f"Baseline: commit {baseline['commit']} ({baseline['timestamp']})")
+        for case, result in results.items():
+            line = f"  {case:<26} {result['seconds']:9.4f}s  peak {result['peak_mb']:8.1f} MB"
+            previous = baseline["results"].get(case) if baseline is not None else None
+            if previous is not None and previous["seconds"] > 0:
+                line += f"  ({result['seconds'] / previous['seconds'] - 1:+.0%} time)"
+            print(line)
+
+    if args.record:
+        os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+        record = {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "scale": scale,
+            "results": results,
+        }
+        with open(args.history, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    if args.check:
+        if baseline is None:
+            print("No baseline run of this scale to compare with.")
+            return
+        messages = regressions(results, baseline["results"], args.time_threshold, args.memory_threshold)
+        for message in messages:
+            print(f"REGRESSION: {message}")
+        if messages:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Concurrent-session load test of the dashboard. Starts the dashboard with
+`streamlit run` against the local cleaned data and the local OpenAI
+stand-in, connects N simulated users to it over Streamlit's websocket
+protocol and reports throughput, per-rerun latency percentiles and the
+server's RSS as concurrency increases. Run from the repository root:
+
+    python -m benchmarks.bench_sessions --sessions 1 4 16 --iterations 3
+
+Each session loads the page, then repeatedly drags the date slider,
+switches the charted indicator, opens the Additional Visualizations tab and
+toggles normalization, opens the AI tab and submits a question. A rerun is
+timed from the moment the session sends it until the server reports the
+script (or fragment) run finished, like a browser waiting for the page.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from mock_openai_server import MockOpenAIServer, MockSettings
+
+DASHBOARD_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dashboard.py")
+
+QUESTION = "How did unemployment respond to the policy rate over this period?"
+
+# Seconds between RSS samples of the server process
+RSS_SAMPLE_INTERVAL = 0.1
+
+# Seconds to wait for the server to come up and for a single rerun
+SERVER_START_TIMEOUT = 60
+RERUN_TIMEOUT = 300
+
+UTC_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_rss_mb(pid):
+    """
+    Return the resident set size of a process in MB, or None where /proc is
+    not available.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler:
+    """
+    Background thread recording the peak RSS of a process while it runs.
+    """
+
+    def __init__(self, pid, interval=RSS_SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.peak = process_rss_mb(pid)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = process_rss_mb(self.pid)
+        if rss is not None:
+            self.peak = max(self.peak or 0.0, rss)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self._sample()
+
+
+class DashboardServer:
+    """
+    `streamlit run dashboard.py` in a subprocess, headless, on a free port.
+    """
+
+    def __init__(self, env, script=DASHBOARD_PATH):
+        self.port = free_port()
+        self.url = f"ws://127.0.0.1:{self.port}/_stcore/stream"
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", script,
+             "--server.headless", "true",
+             "--server.port", str(self.port),
+             "--server.address", "127.0.0.1",
+             # The load test connects without the cookie a browser would get
+             "--server.enableXsrfProtection", "false",
+             "--browser.gatherUsageStats", "false"],
+            cwd=os.path.dirname(script),
+            env={**os.environ, **env},
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+        )
+        self._wait_until_healthy()
+
+    def _wait_until_healthy(self):
+        deadline = time.time() + SERVER_START_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        self.log.seek(0)
+        raise RuntimeError(f"The dashboard server did not start:\n{self.log.read().decode()[-2000:]}")
+
+    @property
+    def rss_mb(self):
+        return process_rss_mb(self.process.pid)
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        self.log.close()
+
+
+class Session:
+    """
+    A scripted browser tab: keeps the widgets the server rendered and the
+    values the user set, and sends them with every rerun like the frontend.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        # Widget label (or tab label) -> (widget id, element proto, fragment id)
+        self.widgets = {}
+        self.tab_id = None
+        self.tab_labels = []
+        # Widget id -> WidgetState sent with every rerun
+        self.states = {}
+
+    async def rerun(self, fragment_id="", triggers=()):
+        """
+        Send a rerun with the current widget values (plus one-off button
+        clicks) and wait for the run to finish. Returns False when the
+        script raised.
+        """
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        for widget_id in triggers:
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            state.trigger_value = True
+        await self.websocket.send(msg.SerializeToString())
+
+        ok = True
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(self.websocket.recv(), RERUN_TIMEOUT))
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                ok &= self._read_delta(forward.delta)
+            elif kind == "script_finished":
+                return ok and forward.script_finished in (
+                    ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+
+    def _read_delta(self, delta):
+        if delta.WhichOneof("type") == "add_block":
+            block = delta.add_block
+            if block.WhichOneof("type") == "tab_container" and block.tab_container.id:
+                self.tab_id = block.tab_container.id
+                self.tab_labels = []
+            elif block.WhichOneof("type") == "tab":
+                self.tab_labels.append(block.tab.label)
+        elif delta.WhichOneof("type") == "new_element":
+            element = delta.new_element
+            kind = element.WhichOneof("type")
+            if kind == "exception":
+                return False
+            proto = getattr(element, kind)
+            if getattr(proto, "id", "") and getattr(proto, "label", ""):
+                self.widgets[proto.label] = (proto.id, proto, delta.fragment_id)
+        return True
+
+    def _state(self, label):
+        widget_id, proto, fragment_id = self.widgets[label]
+        state = WidgetState()
+        state.id = widget_id
+        self.states[widget_id] = state
+        return state, proto, fragment_id
+
+    def set_date_range(self, label, start, end):
+        state, _, fragment_id = self._state(label)
+        # The frontend sends dates as microseconds since the epoch
+        state.double_array_value.data[:] = [
+            (datetime.datetime.combine(day, datetime.time()) - UTC_EPOCH) // datetime.timedelta(microseconds=1)
+            for day in (start, end)
+        ]
+        return fragment_id
+
+    def select(self, label, option):
+        state, _, fragment_id = self._state(label)
+        state.string_value = option
+        return fragment_id
+
+    def options(self, label):
+        return list(self.widgets[label][1].options)
+
+    def toggle(self, label):
+        previous = self.states.get(self.widgets[label][0])
+        state, proto, fragment_id = self._state(label)
+        state.bool_value = not (previous.bool_value if previous is not None else proto.default)
+        return fragment_id
+
+    def type_text(self, label, text):
+        state, _, fragment_id = self._state(label)
+        state.string_value = text
+        return fragment_id
+
+    def open_tab(self, prefix):
+        label = next(label for label in self.tab_labels if prefix in label)
+        state = WidgetState()
+        state.id = self.tab_id
+        state.string_value = label
+        self.states[self.tab_id] = state
+
+    def widget_label(self, prefix):
+        return next(label for label in self.widgets if label.startswith(prefix))
+
+
+async def run_session(url, seed, iterations, think_time, record):
+    """
+    Simulate one user. `record(action, seconds, failed)` is called after
+    every rerun.
+    """
+    rng = random.Random(seed)
+
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as websocket:
+        session = Session(websocket)
+
+        async def rerun(action, fragment_id="", triggers=()):
+            start = time.perf_counter()
+            try:
+                failed = not await session.rerun(fragment_id, triggers)
+            except (asyncio.TimeoutError, websockets.ConnectionClosed):
+                failed = True
+            record(action, time.perf_counter() - start, failed)
+            if think_time:
+                await asyncio.sleep(rng.uniform(0, 2 * think_time))
+
+        await rerun("load")
+
+        for _ in range(iterations):
+            # Drag the date slider through a few positions
+            for _ in range(3):
+                start_year = rng.randint(1950, 2010)
+                session.set_date_range(session.widget_label("Select Date Range"),
+                                       datetime.date(start_year, 1, 1),
+                                       datetime.date(rng.randint(start_year + 5, 2024), 1, 1))
+                await rerun("slider")
+
+            # Switch the charted indicator
+            label = session.widget_label("Choose an indicator")
+            fragment_id = session.select(label, rng.choice(session.options(label)))
+            await rerun("switch_indicator", fragment_id)
+
+            # Open the Additional Visualizations tab and toggle normalization
+            session.open_tab("Additional Visualizations")
+            await rerun("open_visualizations")
+            fragment_id = session.toggle("Normalize Data")
+            await rerun("normalize", fragment_id)
+
+            # Open the AI tab and ask a question
+            session.open_tab("AI-Generated Insights")
+            await rerun("open_ai_insights")
+            fragment_id = session.type_text(session.widget_label("Ask a question"), QUESTION)
+            await rerun("question", fragment_id, triggers=[session.widgets["Submit"][0]])
+
+            session.open_tab("Time Series")
+            await rerun("open_time_series")
+
+
+def percentiles(values):
+    return {
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "p99": round(float(np.percentile(values, 99)), 4),
+    }
+
+
+async def _run_sessions(url, sessions, iterations, think_time, seed, record):
+    await asyncio.gather(*(run_session(url, seed + i, iterations, think_time, record) for i in range(sessions)))
+
+
+def run_load(server, sessions, iterations=3, think_time=0.0, seed=0):
+    """
+    Run `sessions` concurrent simulated users against the server and return
+    the throughput, latency percentiles (overall and per action), failures
+    and the server's RSS.
+    """
+    samples = []
+
+    def record(action, seconds, failed):
+        samples.append((action, seconds, failed))
+
+    rss_start = server.rss_mb
+    with RssSampler(server.process.pid) as sampler:
+        start = time.perf_counter()
+        asyncio.run(_run_sessions(server.url, sessions, iterations, think_time, seed, record))
+        wall = time.perf_counter() - start
+
+    report = {
+        "sessions": sessions,
+        "reruns": len(samples),
+        "failures": sum(failed for _, _, failed in samples),
+        "wall_seconds": round(wall, 3),
+        "reruns_per_second": round(len(samples) / wall, 2),
+        "latency": percentiles([seconds for _, seconds, _ in samples]),
+        "actions": {},
+        "rss_start_mb": round(rss_start, 1) if rss_start is not None else None,
+        "rss_peak_mb": round(sampler.peak, 1) if sampler.peak is not None else None,
+        "rss_end_mb": round(server.rss_mb, 1) if server.rss_mb is not None else None,
+    }
+    for action in dict.fromkeys(action for action, _, _ in samples):
+        report["actions"][action] = percentiles([seconds for name, seconds, _ in samples if name == action])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard with concurrent simulated sessions.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="Concurrent session counts to run.")
+    parser.add_argument("--iterations", type=int, default=3, help="Interaction loops per session.")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds a user waits between interactions.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stand-in LLM latency before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON lines.")
+    args = parser.parse_args()
+
+    settings = MockSettings(latency=args.latency, tokens_per_second=args.tokens_per_second, seed=0)
+    with MockOpenAIServer(settings) as llm, tempfile.TemporaryDirectory() as cache_dir:
+        env = {
+            "OPENAI_BASE_URL": llm.base_url,
+            "OPENAI_API_KEY": "mock",
+            # Summaries start from an empty cache shared by every session of the run
+            "LLM_CACHE_PATH": os.path.join(cache_dir, "summaries.sqlite"),
+            "SPAN_LOG_PATH": "",
+        }
+        with DashboardServer(env) as server:
+            for sessions in args.sessions:
+                report = run_load(server, sessions, args.iterations, args.think_time)
+                report["llm_requests"] = llm.stats.snapshot()["requests"]
+                if args.json:
+                    print(json.dumps(report))
+                    continue
+                print(f"{sessions} session(s): {report['reruns']} reruns in {report['wall_seconds']}s "
+                      f"({report['reruns_per_second']} reruns/s), {report['failures']} failed, "
+                      f"server RSS {report['rss_start_mb']} -> peak {report['rss_peak_mb']} MB")
+                latency = report["latency"]
+                print(f"  {'all reruns':<20} p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  p99 {latency['p99']:.3f}s")
+                for action, latency in report["actions"].items():
+                    print(f"  {action:<20} p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  p99 {latency['p99']:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Memory of several dashboard worker processes holding the same data: each
+worker loads every cleaned table of a synthetic workspace through
+data_loader.load_table, either parsing its own copy or mapping the shared
+dataset published by the pipeline. Reports the load time and the private
+and proportional (PSS) memory per worker. Run from the repository root:
+
+    python -m benchmarks.bench_shared_dataset --workers 1 4 8 --indicators 12 --years 100
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import warnings
+
+# Fields read from /proc/self/status and /proc/self/smaps_rollup (in kB)
+MEMORY_FIELDS = {"RssAnon": "private_mb", "RssFile": "file_mb", "Pss": "pss_mb"}
+
+
+def memory_mb():
+    """
+    Return this process's private (anonymous) RSS, file-backed RSS and PSS in
+    MB. PSS splits every shared page between the processes mapping it.
+    """
+    usage = {}
+    for path in ("/proc/self/status", "/proc/self/smaps_rollup"):
+        try:
+            with open(path) as f:
+                for line in f:
+                    field = line.split(":")[0]
+                    if field in MEMORY_FIELDS:
+                        usage[MEMORY_FIELDS[field]] = int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return usage
+
+
+def _worker(paths, barrier, results):
+    from data_loader import load_table
+
+    baseline = memory_mb()
+    start = time.perf_counter()
+    total = 0.0
+    for path in paths:
+        # Touch every value, as charts and statistics over the full range do
+        total += float(load_table(path).sum().sum())
+    elapsed = time.perf_counter() - start
+
+    # Measure once every worker holds its data, so shared pages are split between them
+    barrier.wait()
+    usage = memory_mb()
+    results.put({
+        "load_seconds": elapsed,
+        **{name: usage.get(name, 0.0) - baseline.get(name, 0.0) for name in MEMORY_FIELDS.values()},
+    })
+    barrier.wait()
+
+
+def run_workers(paths, workers, dataset_dir):
+    """
+    Start `workers` fresh processes loading the tables, with the shared
+    dataset at `dataset_dir` ("" to parse the files), and return the mean of
+    their measurements.
+    """
+    # Spawned workers read SHARED_DATASET_DIR when they import data_loader
+    os.environ["SHARED_DATASET_DIR"] = dataset_dir
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(paths, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {name: round(sum(report[name] for report in reports) / workers, 3) for name in reports[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-worker memory with parsed and shared memory-mapped data.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--indicators", type=int, default=12)
+    parser.add_argument("--years", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON lines.")
+    args = parser.parse_args()
+
+    from data_loader import publish_shared
+    from benchmarks.bench_pipeline import Workspace
+
+    with tempfile.TemporaryDirectory() as root:
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            ws = Workspace(root, args.indicators, args.years, ("daily", "monthly", "quarterly"))
+            ws.clean_all()
+            ws.merge()
+        paths = [ws.cleaned_path(name) for name in ws.dataset] + [ws.merged_path]
+        dataset_dir = os.path.join(root, "shared")
+        publish_shared(paths, dataset_dir)
+
+        for workers in args.workers:
+            for mode, directory in (("parsed", ""), ("mapped", dataset_dir)):
+                result = run_workers(paths, workers, directory)
+                if args.json:
+                    print(json.dumps({"workers": workers, "mode": mode, **result}))
+                    continue
+                print(f"{workers} worker(s), {mode}: load {result['load_seconds']:.3f}s, "
+                      f"private {result['private_mb']:.1f} MB, file-backed {result['file_mb']:.1f} MB, "
+                      f"PSS {result['pss_mb']:.1f} MB per worker")
+
+if __name__ == "__main__":
+    main()
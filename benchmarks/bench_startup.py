@@ -0,0 +1,119 @@
+"""
+Cold start report of the dashboard: import-time breakdown of the modules the
+script loads and the time to its first render, measured in a fresh
+interpreter with Streamlit's headless AppTest. Run from the repository root:
+
+    python -m benchmarks.bench_startup --budget 3
+
+Exits with status 1 when the first render exceeds the budget or loads one of
+the modules that should only be imported on demand, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Fail when the first render takes longer than this many seconds
+STARTUP_BUDGET_SECONDS = 3.0
+
+# Modules that must not be imported before the user opens the views using them
+DEFERRED_MODULES = ("openai", "altair", "matplotlib", "seaborn")
+
+# Marker written to stderr between the harness imports and the script run
+MARKER = "--- first render ---"
+
+CHILD = f"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+sys.stderr.write({MARKER!r} + "\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "first_render_seconds": elapsed,
+    "exceptions": [e.message for e in at.exception],
+    "deferred_loaded": [m for m in {DEFERRED_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def parse_importtime(lines):
+    """
+    Return the cumulative import time in seconds of every top-level import in
+    `python -X importtime` output lines, keyed by module name.
+    """
+    modules = {}
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented below the module that triggered them
+        if name.startswith("  "):
+            continue
+        modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def measure_startup(script="dashboard.py"):
+    """
+    Render the script once in a fresh interpreter and return the time to the
+    first render, the imports it triggered and the deferred modules it loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, os.path.abspath(script)],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup measurement failed:\n{result.stderr[-2000:]}")
+
+    stderr = result.stderr.splitlines()
+    split = stderr.index(MARKER) if MARKER in stderr else 0
+    harness = parse_importtime(stderr[:split])
+    script_imports = parse_importtime(stderr[split:])
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    # Streamlit is loaded by the test harness before the script runs
+    report["streamlit_import_seconds"] = sum(t for name, t in harness.items() if name.split(".")[0] == "streamlit")
+    report["script_import_seconds"] = sum(script_imports.values())
+    report["imports"] = dict(sorted(script_imports.items(), key=lambda item: item[1], reverse=True))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the dashboard's cold start time.")
+    parser.add_argument("--script", default="dashboard.py")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS, help="Maximum seconds to the first render.")
+    parser.add_argument("--top", type=int, default=15, help="Number of imports to list.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    report = measure_startup(args.script)
+    failures = []
+    if report["first_render_seconds"] > args.budget:
+        failures.append(f"first render took {report['first_render_seconds']:.2f}s, over the {args.budget:.2f}s budget")
+    if report["deferred_loaded"]:
+        failures.append(f"first render imported deferred modules: {', '.join(report['deferred_loaded'])}")
+    if report["exceptions"]:
+        failures.append(f"first render raised: {report['exceptions']}")
+    report["budget_seconds"] = args.budget
+    report["failures"] = failures
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print(f"Streamlit import (before the script): {report['streamlit_import_seconds']:.3f}s")
+        print(f"Imports during the first render: {report['script_import_seconds']:.3f}s")
+        for name, seconds in list(report["imports"].items())[:args.top]:
+            print(f"  {name:<30} {seconds:.3f}s")
+        print(f"Time to first render: {report['first_render_seconds']:.3f}s (budget {args.budget:.2f}s)")
+        for failure in failures:
+            print(f"FAILED: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
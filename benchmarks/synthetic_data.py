@@ -0,0 +1,72 @@
+"""
+Synthetic FMP-shaped raw data for benchmarks: one `date,value` CSV per
+indicator, newest observation first, like the files fetch_data.py writes.
+Run from the repository root to write a dataset to a directory:
+
+    python -m benchmarks.synthetic_data --indicators 20 --years 300 --out /tmp/synthetic
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# pandas date offsets of the supported native frequencies
+FREQUENCY_CODES = {"daily": "D", "monthly": "MS", "quarterly": "QS"}
+
+# Last date of every generated series
+END_DATE = "2024-12-31"
+
+# Share of values left empty, which the cleaning step drops
+MISSING_RATE = 0.001
+
+
+def synthetic_series(frequency, years, seed=0, end_date=END_DATE, missing_rate=MISSING_RATE):
+    """
+    Return a DataFrame of `years` of a random walk at the given frequency,
+    with date and value columns, sorted newest first.
+    """
+    end = pd.Timestamp(end_date)
+    # pandas timestamps cannot go back further than 1677
+    start = max(end - pd.DateOffset(years=years), pd.Timestamp("1678-01-01"))
+    dates = pd.date_range(start, end, freq=FREQUENCY_CODES[frequency])
+
+    rng = np.random.default_rng(seed)
+    values = 100.0 + np.cumsum(rng.normal(0.0, 1.0, len(dates)))
+    values = np.round(values, 3)
+    values[rng.random(len(dates)) < missing_rate] = np.nan
+
+    df = pd.DataFrame({"date": dates.strftime("%Y-%m-%d"), "value": values})
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def generate_dataset(out_dir, indicators=4, years=80, frequencies=("daily", "monthly", "quarterly"), seed=0):
+    """
+    Write `indicators` raw files to out_dir, cycling through the given
+    frequencies. Returns {indicator name: (raw file name, frequency)}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    dataset = {}
+    for i in range(indicators):
+        frequency = frequencies[i % len(frequencies)]
+        name = f"Synthetic {frequency.title()} {i:03d}"
+        filename = f"{name.replace(' ', '_')}.csv"
+        synthetic_series(frequency, years, seed=seed + i).to_csv(os.path.join(out_dir, filename), index=False)
+        dataset[name] = (filename, frequency)
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic FMP-shaped raw indicator files.")
+    parser.add_argument("--out", required=True, help="Directory to write the raw files to.")
+    parser.add_argument("--indicators", type=int, default=4)
+    parser.add_argument("--years", type=int, default=80)
+    parser.add_argument("--frequencies", nargs="+", choices=sorted(FREQUENCY_CODES), default=["daily", "monthly", "quarterly"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = generate_dataset(args.out, args.indicators, args.years, tuple(args.frequencies), args.seed)
+    rows = sum(len(pd.read_csv(os.path.join(args.out, filename))) for filename, _ in dataset.values())
+    print(f"Wrote {len(dataset)} raw files ({rows} rows) to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from data_loader import read_range
+from downsample import MAX_CHART_POINTS, downsample_series
+
+# Prepared chart data kept per (indicator pair, date range, normalize flag)
+FIGURE_CACHE_SIZE = 64
+
+# altair is imported inside the functions that build Altair charts, so pages
+# that only show line charts never pay for importing it.
+
+# Keyed LRU cache of prepared chart data. The key includes the modification
+# time and size of both files, so an entry is only reused while they are
+# unchanged.
+_figure_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def line_chart_spec(column="value"):
+    """
+    Return a plain Vega-Lite spec of a line chart of one column against the
+    "date" column, for st.vega_lite_chart. Unlike st.line_chart it needs no
+    altair import.
+    """
+    return {
+        "mark": {"type": "line", "tooltip": True},
+        "encoding": {
+            "x": {"field": "date", "type": "temporal", "title": None},
+            "y": {"field": column, "type": "quantitative", "title": None},
+        },
+    }
+
+
+def correlation_heatmap(corr_matrix):
+    """
+    Build an annotated correlation heatmap as a Vega-Lite chart, rendered in
+    the browser instead of as a server-side image.
+    """
+    import altair as alt
+
+    columns = list(corr_matrix.columns)
+    cells = corr_matrix.rename_axis(index="row", columns="column").stack(future_stack=True).rename("correlation").reset_index()
+
+    base = alt.Chart(cells).encode(
+        x=alt.X("column:N", sort=columns, title=None, axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y("row:N", sort=columns, title=None),
+    )
+    heatmap = base.mark_rect().encode(
+        color=alt.Color(
+            "correlation:Q",
+            scale=alt.Scale(scheme="redblue", domain=[-1, 1], reverse=True),
+            legend=alt.Legend(title="Correlation"),
+        ),
+        tooltip=["row:N", "column:N", alt.Tooltip("correlation:Q", format=".2f")],
+    )
+    labels = base.mark_text(baseline="middle").encode(
+        text=alt.Text("correlation:Q", format=".2f"),
+        color=alt.condition("abs(datum.correlation) > 0.5", alt.value("white"), alt.value("black")),
+    )
+    return (heatmap + labels).properties(height=400)
+
+
+def _comparison_data(data_1, data_2, indicator_1, indicator_2, normalize, max_points):
+    # Inner join of the two series on their common dates, as in the original chart
+    comparison = pd.merge(
+        data_1["value"].rename(indicator_1),
+        data_2["value"].rename(indicator_2),
+        left_index=True,
+        right_index=True,
+    )
+    if normalize:
+        comparison = (comparison - comparison.mean()) / comparison.std()
+
+    # Downsample each line to the chart width and reshape to long form
+    lines = []
+    for name in (indicator_1, indicator_2):
+        line = downsample_series(comparison[name], max_points)
+        lines.append(pd.DataFrame({"date": line.index, "indicator": name, "value": line.to_numpy()}))
+    return pd.concat(lines, ignore_index=True)
+
+
+def comparison_data(file_path_1, file_path_2, indicator_1, indicator_2, start_date, end_date,
+                    normalize=False, max_points=MAX_CHART_POINTS):
+    """
+    Return the long-form (date, indicator, value) data of the side-by-side
+    comparison of two indicators over their common dates in the range.
+    Only the date range of each file is read, and results are cached per
+    indicator pair, range and normalize flag.
+    """
+    stat_1, stat_2 = os.stat(file_path_1), os.stat(file_path_2)
+    key = (os.path.abspath(file_path_1), stat_1.st_mtime_ns, stat_1.st_size,
+           os.path.abspath(file_path_2), stat_2.st_mtime_ns, stat_2.st_size,
+           indicator_1, indicator_2, str(start_date), str(end_date), bool(normalize), max_points)
+
+    with _lock:
+        value = _figure_cache.get(key)
+        if value is not None:
+            _figure_cache.move_to_end(key)
+            return value
+
+    data_1 = read_range(file_path_1, start_date, end_date, columns=["value"])
+    data_2 = read_range(file_path_2, start_date, end_date, columns=["value"])
+    value = _comparison_data(data_1, data_2, indicator_1, indicator_2, normalize, max_points)
+    with _lock:
+        _figure_cache[key] = value
+        _figure_cache.move_to_end(key)
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return value
+
+
+def comparison_chart(data, title, normalized=False):
+    """
+    Build the two-line comparison chart from comparison_data() output.
+    """
+    import altair as alt
+
+    return alt.Chart(data, title=title).mark_line().encode(
+        x=alt.X("date:T", title="Date"),
+        y=alt.Y("value:Q", title="Value (Normalized)" if normalized else "Value"),
+        color=alt.Color("indicator:N", title=None, legend=alt.Legend(orient="top")),
+        tooltip=[alt.Tooltip("date:T"), "indicator:N", alt.Tooltip("value:Q", format=".2f")],
+    ).properties(height=400)
+
+
+def clear_figure_cache():
+    """
+    Drop every cached chart.
+    """
+    with _lock:
+        _figure_cache.clear()
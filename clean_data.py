@@ -1,59 +1,475 @@
+import argparse
+import io
 import os
+import tempfile
+import time
+import numpy as np
 import pandas as pd
+from data_loader import HAS_PYARROW, ColumnarWriter, append_columnar, columnar_path, has_current_columnar, write_columnar
+from instrumentation import span
+from manifest import (
+    clear_watermark, get_history, get_watermark, history_unchanged, last_data_date, load_manifest, raw_history,
+    save_manifest, set_history, set_watermark,
+)
+from parallel import report_outcomes, run_tasks
+from registry import raw_files
 
 # Directory paths
 raw_data_dir = "data/"
 cleaned_data_dir = "cleaned_data/"
 os.makedirs(cleaned_data_dir, exist_ok=True)
 
-# List of indicators and their file paths
-indicators = {
-    "Real GDP": "Real_GDP.csv",
-    "Inflation Rate": "Inflation_Rate.csv",
-    "Unemployment Rate": "Unemployment_Rate.csv",
-    "Federal Funds Rate": "Federal_Funds_Rate.csv",
-}
+# List of indicators and their file paths (from the catalog in indicators.toml)
+indicators = raw_files()
+
+# Rows parsed and written at a time by the streaming cleaner
+STREAM_CHUNK_SIZE = 100_000
+
+# Bytes read per step when reading a file from its end
+READ_BLOCK_SIZE = 1 << 20
+
+# Date formats tried, in order, when detecting the format of a raw file
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y/%m/%d", "%m/%d/%Y", "%d.%m.%Y", "%Y%m%d")
+
+# Rows sampled from the top of a file to detect its date format
+DATE_FORMAT_SAMPLE_ROWS = 1000
+
+# Formats whose raw text is written to the cleaned CSV as is, instead of reformatting the parsed dates
+ISO_DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S")
 
 def clean_csv(filepath, save_path):
     """
     Clean the given CSV file and save the cleaned version.
+    Returns the cleaned DataFrame, or None if cleaning failed.
+    """
+    with span("pipeline.clean", file=filepath) as current_span:
+        print(f"Cleaning file: {filepath}...")
+
+        try:
+            # Load the raw data
+            df = pd.read_csv(filepath)
+            current_span.set(rows=len(df), bytes=os.path.getsize(filepath))
+
+            # Convert 'date' column to datetime format
+            if "date" in df.columns:
+                df["date"] = pd.to_datetime(df["date"])
+            else:
+                raise ValueError("Missing 'date' column in file.")
+
+            # Rename columns to standard format
+            df.rename(columns={"date": "date", "value": "value"}, inplace=True)
+
+            # Handle missing values (drop rows with missing data)
+            df.dropna(inplace=True)
+
+            # Sort by date
+            df.sort_values(by="date", inplace=True)
+
+            # Save the cleaned data
+            df.to_csv(save_path, index=False)
+            print(f"Cleaned data saved to {save_path}")
+
+            # Save a columnar copy for fast, range-sliced reads
+            columnar_save_path = write_columnar(df, save_path)
+            if columnar_save_path:
+                print(f"Columnar copy saved to {columnar_save_path}")
+            return df
+        except Exception as e:
+            current_span.status = "error"
+            print(f"Error cleaning file {filepath}: {e}")
+
+class UnsortedInputError(ValueError):
+    """
+    Raised by the streaming cleaner when the input turns out not to be
+    sorted by date in the direction it is being read.
+    """
+
+
+def detect_date_format(filepath, sample_rows=DATE_FORMAT_SAMPLE_ROWS):
+    """
+    Return the first of DATE_FORMATS that parses every date in the first
+    `sample_rows` rows of a file.
+    """
+    sample = pd.read_csv(filepath, nrows=sample_rows, usecols=["date"], dtype={"date": str})["date"].dropna()
+    for date_format in DATE_FORMATS:
+        if pd.to_datetime(sample, format=date_format, errors="coerce").notna().all():
+            return date_format
+    raise ValueError(f"Unrecognized date format in {filepath}, e.g. {sample.iloc[0] if len(sample) else None!r}")
+
+
+def _read_header(filepath):
     """
-    print(f"Cleaning file: {filepath}...")
+    Return the column names and the byte length of the header line.
+    """
+    with open(filepath, "rb") as f:
+        header = f.readline()
+    return header.decode().strip().split(","), len(header)
+
+
+def _read_blocks_backwards(filepath, start, block_size=READ_BLOCK_SIZE):
+    """
+    Yield lists of the lines after byte offset `start`, from the last line of
+    the file to the first, reading at most `block_size` bytes at a time.
+    """
+    with open(filepath, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b""
+        while position > start:
+            size = min(block_size, position - start)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + remainder).replace(b"\r", b"").split(b"\n")
+            # The first line may continue in the previous block
+            remainder = lines[0]
+            yield [line for line in reversed(lines[1:]) if line]
+        if remainder:
+            yield [remainder]
+
+
+def _chunks_backwards(filepath, columns, start, chunksize):
+    """
+    Yield DataFrames of `chunksize` rows read from the end of a file to its
+    start, each in reverse file order (i.e. ascending for newest-first files).
+    """
+    lines = []
+    for block in _read_blocks_backwards(filepath, start):
+        lines.extend(block)
+        while len(lines) >= chunksize:
+            yield _parse_lines(lines[:chunksize], columns)
+            del lines[:chunksize]
+    if lines:
+        yield _parse_lines(lines, columns)
+
+
+def _parse_lines(lines, columns):
+    return pd.read_csv(io.BytesIO(b"\n".join(lines)), header=None, names=columns, dtype={"date": str})
+
+
+def _parse_dates(df, date_format):
+    """
+    Parse the date column with a fixed format and drop rows with a missing
+    value or an unparseable date. ISO dates keep their text for writing.
+    """
+    if date_format in ISO_DATE_FORMATS:
+        df["_date_text"] = df["date"]
+    df["date"] = pd.to_datetime(df["date"], format=date_format, errors="coerce")
+    return df.dropna()
+
+
+class _SortedOutput:
+    """
+    Incremental writer of date-sorted chunks to the cleaned CSV and its
+    Parquet copy. Rows sharing a date are reduced to one (the first or last
+    in arrival order, per `keep`); the rows of the last date of a chunk are
+    held back until the next chunk shows whether the date continues.
+    """
+
+    def __init__(self, save_path, columns, keep):
+        self.save_path = save_path
+        self.columns = columns
+        self.keep = keep
+        self.pending = None
+        self.last_date = None
+        self.rows = 0
+        self.duplicates = 0
+
+        directory = os.path.dirname(os.path.abspath(save_path))
+        self.csv_tmp = tempfile.NamedTemporaryFile("w", dir=directory, suffix=".csv.tmp", delete=False, newline="")
+        self.csv_tmp.write(",".join(columns) + "\n")
+        self.columnar_tmp = f"{self.csv_tmp.name}.parquet" if HAS_PYARROW else None
+        self.columnar = ColumnarWriter(self.columnar_tmp) if HAS_PYARROW else None
 
+    def write(self, df):
+        if df.empty:
+            return
+        dates = df["date"]
+        if not dates.is_monotonic_increasing or (self.last_date is not None and dates.iloc[0] < self.last_date):
+            raise UnsortedInputError("Input is not sorted by date.")
+        self.last_date = dates.iloc[-1]
+
+        if self.pending is not None:
+            df = pd.concat([self.pending, df], ignore_index=True)
+        held = (df["date"] == df["date"].iloc[-1]).to_numpy()
+        self.pending = df[held]
+        self._emit(df[~held])
+
+    def _emit(self, df):
+        duplicated = df["date"].duplicated(keep=self.keep)
+        self.duplicates += int(duplicated.sum())
+        df = df[~duplicated]
+        if df.empty:
+            return
+        text = df[self.columns]
+        if "_date_text" in df:
+            text = text.assign(date=df["_date_text"])
+        self.csv_tmp.write(text.to_csv(header=False, index=False))
+        if self.columnar is not None:
+            self.columnar.write(df[self.columns])
+        self.rows += len(df)
+
+    def close(self):
+        """
+        Write the held-back rows and move the files into place. The CSV is
+        replaced first so that the Parquet copy ends up at least as recent.
+        """
+        if self.pending is not None:
+            self._emit(self.pending)
+        self.csv_tmp.close()
+        os.replace(self.csv_tmp.name, self.save_path)
+        if self.columnar is not None:
+            self.columnar.close()
+            if self.columnar.writer is not None:
+                os.replace(self.columnar_tmp, columnar_path(self.save_path))
+
+    def abort(self):
+        self.csv_tmp.close()
+        if self.columnar is not None:
+            self.columnar.close()
+        for path in (self.csv_tmp.name, self.columnar_tmp):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def _stream_sorted(chunks, save_path, columns, date_format, keep):
+    """
+    Clean chunks arriving in ascending date order straight into the output.
+    Returns (input rows, output rows, duplicates dropped).
+    """
+    output = _SortedOutput(save_path, columns, keep)
+    rows_in = 0
     try:
-        # Load the raw data
-        df = pd.read_csv(filepath)
+        for chunk in chunks:
+            rows_in += len(chunk)
+            output.write(_parse_dates(chunk, date_format))
+        output.close()
+    except BaseException:
+        output.abort()
+        raise
+    return rows_in, output.rows, output.duplicates
+
+
+def _merge_runs(runs, columns, block_rows):
+    """
+    Yield the rows of sorted runs (dicts of memory-mapped column arrays with
+    a "_row" tiebreak column) as DataFrames in ascending (date, row) order,
+    reading at most `block_rows` rows per run at a time.
+    """
+    positions = [0] * len(runs)
+    while True:
+        active = [i for i, run in enumerate(runs) if positions[i] < len(run["date"])]
+        if not active:
+            return
+        # Every row up to the smallest block end of the active runs can be emitted
+        boundary = min(runs[i]["date"][min(positions[i] + block_rows, len(runs[i]["date"])) - 1] for i in active)
+        parts = []
+        for i in active:
+            end = positions[i] + int(np.searchsorted(runs[i]["date"][positions[i]:], boundary, side="right"))
+            parts.append({name: np.asarray(runs[i][name][positions[i]:end]) for name in runs[i]})
+            positions[i] = end
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        order = np.lexsort((merged["_row"], merged["date"]))
+        df = pd.DataFrame({name: merged[name][order] for name in columns})
+        df["date"] = df["date"].astype("datetime64[ns]")
+        yield df
+
+
+def _external_sort(filepath, save_path, columns, date_format, chunksize):
+    """
+    Clean an unsorted file: sort it in chunks into memory-mapped run files,
+    then merge the runs into the output. Of rows sharing a date, the first
+    in the file is kept. Returns (input rows, output rows, duplicates dropped).
+    """
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(save_path))) as run_dir:
+        runs = []
+        rows_in = 0
+        for chunk in pd.read_csv(filepath, chunksize=chunksize, dtype={"date": str}):
+            chunk["_row"] = np.arange(rows_in, rows_in + len(chunk))
+            rows_in += len(chunk)
+            chunk = _parse_dates(chunk, date_format)
+            chunk = chunk.iloc[np.lexsort((chunk["_row"].to_numpy(), chunk["date"].to_numpy()))]
+
+            run = {}
+            for name in ["date", "_row"] + [c for c in columns if c != "date"]:
+                values = chunk[name].to_numpy()
+                values = values.astype(np.int64) if name in ("date", "_row") else values.astype(np.float64)
+                path = os.path.join(run_dir, f"run{len(runs):05d}_{len(run)}.npy")
+                np.save(path, values)
+                run[name] = np.load(path, mmap_mode="r")
+            runs.append(run)
+
+        output = _SortedOutput(save_path, columns, keep="first")
+        try:
+            for df in _merge_runs(runs, columns, max(1, chunksize // max(1, len(runs)))):
+                output.write(df)
+            output.close()
+        except BaseException:
+            output.abort()
+            raise
+        return rows_in, output.rows, output.duplicates
+
+
+def clean_csv_streaming(filepath, save_path, date_format=None, chunksize=STREAM_CHUNK_SIZE):
+    """
+    Clean a raw file with bounded memory and write the cleaned CSV (and its
+    Parquet copy) incrementally. Dates are parsed with a fixed format
+    (detected when not given). Newest-first FMP files are read from the end
+    in blocks, so the output comes out sorted without sorting; oldest-first
+    files are read forward; anything else goes through an external merge
+    sort. Of rows sharing a date, the first in the raw file is kept.
+    Returns a dict of statistics, or None if cleaning failed.
+    """
+    with span("pipeline.clean", file=filepath, streaming=True) as current_span:
+        print(f"Cleaning file: {filepath} (streaming)...")
+
+        try:
+            columns, header_size = _read_header(filepath)
+            if "date" not in columns:
+                raise ValueError("Missing 'date' column in file.")
+            date_format = date_format or detect_date_format(filepath)
+
+            # Compare the first and last rows to pick the reading direction
+            first = next(_chunks_backwards(filepath, columns, header_size, 1), None)
+            head = pd.read_csv(filepath, nrows=1, dtype={"date": str})
+            dates = pd.to_datetime(pd.concat([head["date"], first["date"]]) if first is not None else head["date"],
+                                   format=date_format, errors="coerce")
+
+            try:
+                if len(dates) == 2 and dates.iloc[0] > dates.iloc[1]:
+                    mode = "reverse"
+                    chunks = _chunks_backwards(filepath, columns, header_size, chunksize)
+                    rows_in, rows_out, duplicates = _stream_sorted(chunks, save_path, columns, date_format, keep="last")
+                else:
+                    mode = "forward"
+                    chunks = pd.read_csv(filepath, chunksize=chunksize, dtype={"date": str})
+                    rows_in, rows_out, duplicates = _stream_sorted(chunks, save_path, columns, date_format, keep="first")
+            except UnsortedInputError:
+                print("Input is not sorted by date; cleaning with an external merge sort.")
+                mode = "external_sort"
+                rows_in, rows_out, duplicates = _external_sort(filepath, save_path, columns, date_format, chunksize)
+
+            current_span.set(rows=rows_in, bytes=os.path.getsize(filepath), mode=mode)
+            print(f"Cleaned data saved to {save_path} ({rows_out} rows, {duplicates} duplicate dates dropped)")
+            return {
+                "mode": mode,
+                "date_format": date_format,
+                "rows_in": rows_in,
+                "rows_out": rows_out,
+                "duplicates": duplicates,
+                "dropped": rows_in - rows_out - duplicates,
+            }
+        except Exception as e:
+            current_span.status = "error"
+            print(f"Error cleaning file {filepath}: {e}")
+
 
-        # Convert 'date' column to datetime format
-        if "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"])
-        else:
-            raise ValueError("Missing 'date' column in file.")
+def read_new_raw_rows(filepath, watermark, chunksize=1000):
+    """
+    Read the rows newer than `watermark` from a raw FMP file. Raw files are
+    stored newest-first, so reading stops at the first chunk that reaches the
+    watermark instead of parsing the whole history.
+    """
+    chunks = []
+    for chunk in pd.read_csv(filepath, chunksize=chunksize):
+        chunk["date"] = pd.to_datetime(chunk["date"])
+        newer = chunk[chunk["date"] > watermark]
+        chunks.append(newer)
+        if len(newer) < len(chunk):
+            break
+    return pd.concat(chunks) if chunks else pd.DataFrame(columns=["date", "value"])
+
+def clean_new_rows(filepath, save_path, watermark):
+    """
+    Clean only the raw observations newer than `watermark` and append them to
+    an existing cleaned file. Returns the appended rows.
+    """
+    with span("pipeline.clean", file=filepath, incremental=True) as current_span:
+        print(f"Cleaning new rows of {filepath} after {watermark.date()}...")
 
-        # Rename columns to standard format
-        df.rename(columns={"date": "date", "value": "value"}, inplace=True)
+        try:
+            df = read_new_raw_rows(filepath, watermark)
+            current_span.set(rows=len(df))
 
-        # Handle missing values (drop rows with missing data)
-        df.dropna(inplace=True)
+            # Handle missing values and sort by date, as in a full clean
+            df.dropna(inplace=True)
+            df.sort_values(by="date", inplace=True)
 
-        # Sort by date
-        df.sort_values(by="date", inplace=True)
+            if df.empty:
+                print("No new rows to clean.")
+                return df
 
-        # Save the cleaned data
-        df.to_csv(save_path, index=False)
-        print(f"Cleaned data saved to {save_path}")
-    except Exception as e:
-        print(f"Error cleaning file {filepath}: {e}")
+            columnar_current = has_current_columnar(save_path)
+            df.to_csv(save_path, mode="a", header=False, index=False)
+            if columnar_current:
+                append_columnar(df, save_path)
+            print(f"{len(df)} cleaned row(s) appended to {save_path}")
+            return df
+        except Exception as e:
+            current_span.status = "error"
+            print(f"Error cleaning file {filepath}: {e}")
+
+def clean_indicator(raw_filepath, cleaned_filepath, watermark=None, stream=False, date_format=None):
+    """
+    Clean one indicator file, only its rows after `watermark` when given, and
+    return the last date in the cleaned file. Raises ValueError on failure.
+    """
+    if watermark is not None:
+        cleaned = clean_new_rows(raw_filepath, cleaned_filepath, watermark)
+    elif stream:
+        cleaned = clean_csv_streaming(raw_filepath, cleaned_filepath, date_format)
+    else:
+        cleaned = clean_csv(raw_filepath, cleaned_filepath)
+    if cleaned is None:
+        raise ValueError(f"Cleaning failed for {raw_filepath}")
+    return last_data_date(cleaned_filepath)
 
 def main():
+    parser = argparse.ArgumentParser(description="Clean raw indicator files.")
+    parser.add_argument("--full", action="store_true", help="Re-clean every file instead of only new observations.")
+    parser.add_argument("--stream", action="store_true", help="Clean full files with the bounded-memory streaming cleaner.")
+    parser.add_argument("--date-format", help="strptime format of the raw dates for --stream (detected by default).")
+    parser.add_argument("--jobs", type=int, help="Worker processes cleaning files in parallel (0 for one per CPU).")
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+
+    tasks = {}
     for indicator, filename in indicators.items():
         raw_filepath = os.path.join(raw_data_dir, filename)
         cleaned_filepath = os.path.join(cleaned_data_dir, f"cleaned_{filename}")
 
-        if os.path.exists(raw_filepath):
-            clean_csv(raw_filepath, cleaned_filepath)
-        else:
+        if not os.path.exists(raw_filepath):
             print(f"File not found: {raw_filepath}")
+            continue
+
+        watermark = None
+        if not args.full and os.path.exists(cleaned_filepath):
+            watermark = get_watermark(manifest, indicator, "cleaned") or last_data_date(cleaned_filepath)
+
+            # Only new rows are appended, so a revised history needs a full re-clean
+            history = get_history(manifest, indicator)
+            if watermark is not None and not history_unchanged(raw_filepath, history):
+                reason = "changed since it was cleaned" if history else "not recorded"
+                print(f"Warning: history of {raw_filepath} {reason}; re-cleaning the whole file.")
+                watermark = None
+        tasks[indicator] = (clean_indicator, (raw_filepath, cleaned_filepath, watermark, args.stream, args.date_format))
+
+    start = time.perf_counter()
+    outcomes = run_tasks(tasks, args.jobs)
+    failures = report_outcomes(outcomes, time.perf_counter() - start)
+
+    # Watermarks are recorded here, not in the workers, so that the manifest is written once
+    for indicator, outcome in outcomes.items():
+        if outcome["result"] is not None:
+            raw_filepath, _, watermark = tasks[indicator][1][:3]
+            set_watermark(manifest, indicator, "cleaned", outcome["result"])
+            set_history(manifest, indicator, raw_history(raw_filepath))
+            if watermark is None:
+                # A full re-clean may have revised merged months too
+                clear_watermark(manifest, indicator, "merged")
+    save_manifest(manifest)
+
+    if failures:
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from data_loader import load_derived
+
+
+class CorrelationIndex:
+    """
+    Prefix sums over a date-indexed table that give the Pearson correlation
+    matrix of any date window in O(k^2) time for k columns, regardless of the
+    window length, plus rolling correlations between two columns.
+
+    Missing values are handled pairwise, like DataFrame.corr(): every pair
+    uses only the rows where both columns are present. For that, the running
+    count, sums, sums of squares and cross products are kept per column pair,
+    which takes O(n * k^2) memory for n rows.
+    """
+
+    def __init__(self, df):
+        self.columns = list(df.columns)
+        self.dates = df.index.to_numpy(dtype="datetime64[ns]")
+        values = df.to_numpy(dtype=float)
+
+        # Correlation is shift invariant; centring keeps the sums well conditioned
+        values = values - np.nanmean(values, axis=0) if len(values) else values
+        present = ~np.isnan(values)
+        x = np.where(present, values, 0.0)
+        both = present[:, :, None] & present[:, None, :]
+
+        def prefix(rows):
+            return np.concatenate((np.zeros((1,) + rows.shape[1:]), np.cumsum(rows, axis=0)))
+
+        # [a, b] entries only count rows where both a and b are present
+        self.count = prefix(both.astype(float))
+        self.sum = prefix(x[:, :, None] * both)
+        self.sum_sq = prefix((x * x)[:, :, None] * both)
+        self.cross = prefix(x[:, :, None] * x[:, None, :])
+
+    def _bounds(self, start, end):
+        i = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side="left"))
+        j = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side="right"))
+        return i, max(i, j)
+
+    @staticmethod
+    def _correlation(n, sum_a, sum_b, sum_sq_a, sum_sq_b, cross):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            covariance = n * cross - sum_a * sum_b
+            variance_a = n * sum_sq_a - sum_a * sum_a
+            variance_b = n * sum_sq_b - sum_b * sum_b
+            r = covariance / np.sqrt(variance_a * variance_b)
+        r = np.where((n >= 2) & (variance_a > 0) & (variance_b > 0), r, np.nan)
+        return np.clip(r, -1.0, 1.0)
+
+    def corr(self, start=None, end=None, columns=None):
+        """
+        Return the correlation matrix of the rows between start and end
+        (inclusive) as a DataFrame, optionally restricted to some columns.
+        """
+        i, j = self._bounds(start, end)
+        n = self.count[j] - self.count[i]
+        sums = self.sum[j] - self.sum[i]
+        sum_sq = self.sum_sq[j] - self.sum_sq[i]
+        cross = self.cross[j] - self.cross[i]
+
+        r = self._correlation(n, sums, sums.T, sum_sq, sum_sq.T, cross)
+        matrix = pd.DataFrame(r, index=self.columns, columns=self.columns)
+        if columns is not None:
+            matrix = matrix.loc[columns, columns]
+        return matrix
+
+    def rolling(self, column_a, column_b, window, min_periods=None, start=None, end=None):
+        """
+        Return the correlation between two columns over a rolling window of
+        `window` rows ending at each row, like Series.rolling(window).corr().
+        """
+        a, b = self.columns.index(column_a), self.columns.index(column_b)
+        min_periods = window if min_periods is None else min_periods
+        i, j = self._bounds(start, end)
+
+        # Window [t - window + 1, t] for every row t, using the prefix sums
+        ends = np.arange(i + 1, j + 1)
+        starts = np.maximum(ends - window, 0)
+
+        def window_sum(prefix_array, x, y):
+            return prefix_array[ends, x, y] - prefix_array[starts, x, y]
+
+        n = window_sum(self.count, a, b)
+        r = self._correlation(
+            n,
+            window_sum(self.sum, a, b),
+            window_sum(self.sum, b, a),
+            window_sum(self.sum_sq, a, b),
+            window_sum(self.sum_sq, b, a),
+            window_sum(self.cross, a, b),
+        )
+        r = np.where(n >= max(min_periods, 2), r, np.nan)
+        return pd.Series(r, index=pd.DatetimeIndex(self.dates[i:j], name="date"), name=f"{column_a} / {column_b}")
+
+
+def load_correlation_index(filepath):
+    """
+    Return the CorrelationIndex of a cleaned data file (normally the merged
+    table), built once per version of the file.
+    """
+    return load_derived(filepath, "correlation_index", CorrelationIndex)
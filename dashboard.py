@@ -1,15 +1,37 @@
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
-from datetime import date
-from openai import OpenAI
-import altair as alt
-
-
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from ai_insights import get_client, stream_answer, stream_summaries
+from charts import comparison_chart, comparison_data, correlation_heatmap, line_chart_spec
+from correlation_engine import load_correlation_index
+from data_loader import read_range
+from downsample import MAX_CHART_POINTS, downsample_series, load_downsampler
+from instrumentation import collect, span, start_metrics_server
+from llm_cache import get_summary_cache
+from pyramid import resample_range
+from range_stats import load_range_stats
+from registry import cleaned_files, load_registry
+
+# Heavy dependencies (openai, altair) are imported on first use, so a session
+# that never opens the Additional Visualizations or AI tabs does not load them.
+# Run `python -m benchmarks.bench_startup` to check the cold start time.
+
+@st.cache_resource
+def serve_metrics(port):
+    """
+    Start the metrics server once per process. When another process on the
+    host already holds the port, warn and run without it.
+    """
+    try:
+        return start_metrics_server(port)
+    except OSError as e:
+        print(f"Warning: metrics server not started on port {port}: {e}")
+        return None
+
+
+# Serve the timing metrics of this process for Prometheus when METRICS_PORT is set
+if os.getenv("METRICS_PORT"):
+    serve_metrics(int(os.getenv("METRICS_PORT")))
 
 # Title of the dashboard
 st.title("Macroeconomic Dashboard")
@@ -18,13 +40,12 @@ st.markdown("### Explore trends and relationships among key economic indicators.
 # Directory containing cleaned data
 data_dir = "cleaned_data/"
 
-# List of indicators and their corresponding file names
-indicators = {
-    "Real GDP": "cleaned_Real_GDP.csv",
-    "Inflation Rate": "cleaned_Inflation_Rate.csv",
-    "Unemployment Rate": "cleaned_Unemployment_Rate.csv",
-    "Federal Funds Rate": "cleaned_Federal_Funds_Rate.csv"
-}
+# List of indicators and their corresponding file names (from the catalog in indicators.toml)
+registry = load_registry()
+indicators = cleaned_files()
+
+# Number of indicators selected by default for the multi-indicator views
+DEFAULT_INDICATOR_COUNT = 4
 
 # Sidebar: Date range slider
 st.sidebar.header("Filter Date Range")
@@ -37,302 +58,289 @@ start_date, end_date = st.sidebar.slider(
     format="YYYY-MM"
 )
 
-# Tabs for better organization
-tab1, tab2, tab3, tab4 = st.tabs(["📈 Time Series Visualization", "📊 Key Statistics", "📉 Additional Visualizations", "💡 AI-Generated Insights"])
+# Sidebar: Indicators used by the statistics, heatmap and AI views. Only the
+# selected series are loaded, so reruns do not scale with the catalog size.
+st.sidebar.header("Select Indicators")
+selected_indicators = st.sidebar.multiselect(
+    "Indicators to analyze:",
+    list(indicators.keys()),
+    default=list(indicators.keys())[:DEFAULT_INDICATOR_COUNT],
+)
+
+# Tabs for better organization. Only the open tab runs on a rerun, and the
+# sections with their own widgets are fragments, so interacting with them
+# reruns that section alone instead of the whole script. The tab bodies are
+# defined as functions below and called for the open tab at the end.
+tab1, tab2, tab3, tab4 = st.tabs(
+    ["📈 Time Series Visualization", "📊 Key Statistics", "📉 Additional Visualizations", "💡 AI-Generated Insights"],
+    key="active_tab",
+    on_change="rerun",
+)
+
 
 # Tab 1: Time Series Visualization
-with tab1:
-    st.subheader("Time Series Visualization")
-    selected_indicator = st.selectbox("Choose an indicator to display:", list(indicators.keys()))
-    if selected_indicator:
-        file_path = os.path.join(data_dir, indicators[selected_indicator])
-
-        if os.path.exists(file_path):
-            # Load the data
-            data = pd.read_csv(file_path, parse_dates=["date"])
-            data.set_index("date", inplace=True)
-
-            # Filter data based on the selected date range
-            filtered_data = data.loc[start_date:end_date]
-
-            # Check if filtered data is empty
-            if filtered_data.empty:
-                st.warning(f"No data available for {selected_indicator} in the selected date range ({start_date} to {end_date}).")
+@st.fragment
+def time_series_tab(start_date, end_date):
+    with span("dashboard.time_series") as current_span:
+        st.subheader("Time Series Visualization")
+        selected_indicator = st.selectbox("Choose an indicator to display:", list(indicators.keys()))
+        if selected_indicator:
+            file_path = os.path.join(data_dir, indicators[selected_indicator])
+
+            if os.path.exists(file_path):
+                # At most MAX_CHART_POINTS points of the selected range, taken from a
+                # min/max pyramid built once per file so peaks and troughs survive
+                chart_data = load_downsampler(file_path).query(start_date, end_date, MAX_CHART_POINTS)
+                current_span.set(indicator=selected_indicator, rows=len(chart_data))
+
+                # Check if filtered data is empty
+                if chart_data.empty:
+                    st.warning(f"No data available for {selected_indicator} in the selected date range ({start_date} to {end_date}).")
+                else:
+                    # Display the filtered data as a line chart
+                    st.write(f"### {selected_indicator} Over Time")
+                    st.vega_lite_chart(chart_data.reset_index(), line_chart_spec(), width="stretch")
             else:
-                # Display the filtered data as a line chart
-                st.write(f"### {selected_indicator} Over Time")
-                st.line_chart(filtered_data["value"], use_container_width=True)
-        else:
-            st.error(f"Data file not found for {selected_indicator}: {file_path}")
+                st.error(f"Data file not found for {selected_indicator}: {file_path}")
 
 
 # Tab 2: Key Statistics
-with tab2:
-    st.subheader("Key Statistics and Comparison")
-
-    # Individual statistics for each indicator
-    for name, filename in indicators.items():
-        file_path = os.path.join(data_dir, filename)
-        st.markdown(f"#### {name}")
-        if os.path.exists(file_path):
-            data = pd.read_csv(file_path, parse_dates=["date"])
-            data.set_index("date", inplace=True)
-
-            # Filter data for the selected range
-            filtered_data = data.loc[start_date:end_date]
-
-            if not filtered_data.empty:
-                most_recent_date = filtered_data.index[-1]
-                most_recent_value = filtered_data["value"].iloc[-1]
-                max_value = filtered_data["value"].max()
-                max_date = filtered_data["value"].idxmax()
-                min_value = filtered_data["value"].min()
-                min_date = filtered_data["value"].idxmin()
-
-                # Display stats
-                st.write(f"**Most Recent Value ({most_recent_date.date()}):** {most_recent_value:.2f}")
-                st.write(f"**Max Value ({max_date.date()}):** {max_value:.2f}")
-                st.write(f"**Min Value ({min_date.date()}):** {min_value:.2f}")
+def key_statistics_tab(selected_indicators, start_date, end_date):
+    with span("dashboard.statistics", indicators=len(selected_indicators)):
+        st.subheader("Key Statistics and Comparison")
+
+        # Individual statistics for each selected indicator
+        for name in selected_indicators:
+            file_path = os.path.join(data_dir, indicators[name])
+            st.markdown(f"#### {name}")
+            if os.path.exists(file_path):
+                # Query the precomputed range index instead of scanning the selected rows
+                stats = load_range_stats(file_path).query(start_date, end_date)
+
+                if stats is not None:
+                    # Display stats
+                    st.write(f"**Most Recent Value ({stats['most_recent_date'].date()}):** {stats['most_recent_value']:.2f}")
+                    st.write(f"**Max Value ({stats['max_date'].date()}):** {stats['max_value']:.2f}")
+                    st.write(f"**Min Value ({stats['min_date'].date()}):** {stats['min_value']:.2f}")
+                    # The standard deviation needs at least two observations
+                    std = f"{stats['std']:.2f}" if stats["count"] > 1 else "n/a"
+                    st.write(f"**Mean:** {stats['mean']:.2f} &nbsp; **Std. Dev.:** {std}")
+                else:
+                    st.write("No data available for the selected range.")
             else:
-                st.write("No data available for the selected range.")
-        else:
-            st.error(f"Data file not found for {name}.")
+                st.error(f"Data file not found for {name}.")
 
 
 # Tab 3: Additional Visualizations
-with tab3:
-    st.subheader("Additional Visualizations")
-
-    # Correlation Heatmap
-    st.subheader("Correlation Heatmap of Economic Indicators")
-    merged_file_path = os.path.join(data_dir, "merged_indicators.csv")
-    if os.path.exists(merged_file_path):
-        merged_data = pd.read_csv(merged_file_path, parse_dates=["date"])
-        filtered_merged_data = merged_data[
-            (merged_data["date"] >= pd.to_datetime(start_date)) & (merged_data["date"] <= pd.to_datetime(end_date))
-        ]
-        corr_matrix = filtered_merged_data.corr()
-
-        # Plot heatmap using Seaborn
-        plt.figure(figsize=(10, 6))
-        sns.heatmap(corr_matrix, annot=True, cmap="coolwarm", fmt=".2f", cbar=True)
-        st.pyplot(plt.gcf())
-    else:
-        st.error("Merged indicators file not found.")
-
-    # Side-by-side comparison of two indicators
-    st.subheader("Side-by-Side Comparison")
-    indicator_1 = st.selectbox("Select the first indicator:", list(indicators.keys()), index=0, key="indicator_1")
-    indicator_2 = st.selectbox("Select the second indicator:", list(indicators.keys()), index=1, key="indicator_2")
-
-    # Option to normalize data
-    normalize_data = st.checkbox("Normalize Data", value=False, key="normalize_data")
-
-    if indicator_1 != indicator_2:
-        file_path_1 = os.path.join(data_dir, indicators[indicator_1])
-        file_path_2 = os.path.join(data_dir, indicators[indicator_2])
-
-        if os.path.exists(file_path_1) and os.path.exists(file_path_2):
-            data_1 = pd.read_csv(file_path_1, parse_dates=["date"])
-            data_2 = pd.read_csv(file_path_2, parse_dates=["date"])
-
-            # Filter data for the selected date range
-            filtered_data_1 = data_1[
-                (data_1["date"] >= str(start_date)) & (data_1["date"] <= str(end_date))
-            ]
-            filtered_data_2 = data_2[
-                (data_2["date"] >= str(start_date)) & (data_2["date"] <= str(end_date))
-            ]
-
-            # Check if filtered data is empty for either indicator
-            if filtered_data_1.empty and filtered_data_2.empty:
-                st.warning(
-                    f"No data available for both {indicator_1} and {indicator_2} in the selected date range ({start_date} to {end_date})."
-                )
-            elif filtered_data_1.empty:
-                st.warning(f"No data available for {indicator_1} in the selected date range ({start_date} to {end_date}).")
-            elif filtered_data_2.empty:
-                st.warning(f"No data available for {indicator_2} in the selected date range ({start_date} to {end_date}).")
-            else:
-                # Merge the two filtered dataframes on the date column
-                merged_comparison = pd.merge(
-                    filtered_data_1, filtered_data_2, on="date", suffixes=(f" ({indicator_1})", f" ({indicator_2})")
-                )
-
-                # Normalize data if the checkbox is selected
-                if normalize_data:
-                    merged_comparison[f"value ({indicator_1})"] = (
-                        merged_comparison[f"value ({indicator_1})"] - merged_comparison[f"value ({indicator_1})"].mean()
-                    ) / merged_comparison[f"value ({indicator_1})"].std()
-                    merged_comparison[f"value ({indicator_2})"] = (
-                        merged_comparison[f"value ({indicator_2})"] - merged_comparison[f"value ({indicator_2})"].mean()
-                    ) / merged_comparison[f"value ({indicator_2})"].std()
-
-                # Plot the comparison
-                st.write(f"### Comparison of {indicator_1} and {indicator_2}")
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.plot(pd.to_datetime(merged_comparison["date"]), merged_comparison[f"value ({indicator_1})"], label=indicator_1)
-                ax.plot(pd.to_datetime(merged_comparison["date"]), merged_comparison[f"value ({indicator_2})"], label=indicator_2)
-                ax.set_xlabel("Date")
-                ax.set_ylabel("Value (Normalized)" if normalize_data else "Value")
-                ax.set_title(f"{indicator_1} vs {indicator_2}")
-                ax.legend()
-                plt.xticks(rotation=45)
-                st.pyplot(fig)
+def correlation_heatmap_section(selected_indicators, start_date, end_date):
+    with span("dashboard.heatmap", indicators=len(selected_indicators)):
+        # Correlation Heatmap
+        st.subheader("Correlation Heatmap of Economic Indicators")
+        merged_file_path = os.path.join(data_dir, "merged_indicators.csv")
+        if os.path.exists(merged_file_path):
+            # Correlations for the selected window come from precomputed prefix sums
+            correlation_index = load_correlation_index(merged_file_path)
+            selected_columns = [name for name in selected_indicators if name in correlation_index.columns]
+            corr_matrix = correlation_index.corr(start_date, end_date, columns=selected_columns)
+
+            # Rendered client-side from the small matrix rather than as a server-side image
+            st.altair_chart(correlation_heatmap(corr_matrix), width="stretch")
         else:
-            st.error("One or both of the selected data files are missing.")
+            st.error("Merged indicators file not found.")
 
 
+@st.fragment
+def comparison_section(start_date, end_date):
+    with span("dashboard.comparison"):
+        merged_file_path = os.path.join(data_dir, "merged_indicators.csv")
 
-# Tab 4: AI-Generated Insights
-with tab4:
-    st.subheader("AI-Generated Insights")
-    st.write("The insights below are generated using only the data from the selected date range (quarterly).")
-
-    # Reload button
-    if st.button("Reload Summary"):
-        # Clear stored summary in session state
-        if "summary" in st.session_state:
-            del st.session_state["summary"]
-
-    # Load and process all indicators
-    all_data = {}
-    for name, filename in indicators.items():
-        file_path = os.path.join(data_dir, filename)
-        if os.path.exists(file_path):
-            data = pd.read_csv(file_path, parse_dates=["date"])
-            data.set_index("date", inplace=True)
-
-            # Resample all data to quarterly frequency
-            filtered_data = data.loc[start_date:end_date].resample("Q").mean()
-            all_data[name] = filtered_data
-
-    # Generate concise summary function
-    def generate_summary(all_data):
-        summary_texts = []
-        for name, data in all_data.items():
-            if not data.empty:
-                data_snippet = data.to_csv(index=True)
-                prompt = (
-                    f"Provide a concise 5-sentence analysis of trends in {name} for the period {start_date} to {end_date}, "
-                    f"highlighting major trends, key events, and recent changes. Data:\n{data_snippet}"
-                )
+        # Side-by-side comparison of two indicators
+        st.subheader("Side-by-Side Comparison")
+        indicator_1 = st.selectbox("Select the first indicator:", list(indicators.keys()), index=0, key="indicator_1")
+        indicator_2 = st.selectbox("Select the second indicator:", list(indicators.keys()), index=1, key="indicator_2")
 
-                try:
-                    response = client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[
-                            {"role": "system", "content": "You are an economic analyst providing concise summaries of data trends."},
-                            {"role": "user", "content": prompt},
-                        ],
-                        temperature=0.7,
-                        max_tokens=250,
+        # Option to normalize data
+        normalize_data = st.checkbox("Normalize Data", value=False, key="normalize_data")
+
+        if indicator_1 != indicator_2:
+            file_path_1 = os.path.join(data_dir, indicators[indicator_1])
+            file_path_2 = os.path.join(data_dir, indicators[indicator_2])
+
+            if os.path.exists(file_path_1) and os.path.exists(file_path_2):
+                # Check if filtered data is empty for either indicator, reading only the range
+                empty_1 = read_range(file_path_1, start_date, end_date, columns=["value"]).empty
+                empty_2 = read_range(file_path_2, start_date, end_date, columns=["value"]).empty
+                if empty_1 and empty_2:
+                    st.warning(
+                        f"No data available for both {indicator_1} and {indicator_2} in the selected date range ({start_date} to {end_date})."
+                    )
+                elif empty_1:
+                    st.warning(f"No data available for {indicator_1} in the selected date range ({start_date} to {end_date}).")
+                elif empty_2:
+                    st.warning(f"No data available for {indicator_2} in the selected date range ({start_date} to {end_date}).")
+                else:
+                    # Joined, normalized and downsampled data, cached per pair, range and normalize flag
+                    comparison = comparison_data(
+                        file_path_1, file_path_2, indicator_1, indicator_2, start_date, end_date, normalize=normalize_data
                     )
-                    summary_texts.append(f"**{name}:** {response.choices[0].message.content.strip()}")
-                except Exception as e:
-                    summary_texts.append(f"**{name}:** An error occurred while generating the summary: {str(e)}")
-        return "\n\n".join(summary_texts)
 
-    # Store the summary in Streamlit session state to avoid recomputation
-    if "summary" not in st.session_state:
-        if all_data:
-            st.session_state["summary"] = generate_summary(all_data)
-        else:
-            st.session_state["summary"] = "No data available in the selected time range for generating a summary."
-
-    # Display the stored summary
-    st.subheader("Summary")
-    st.write(st.session_state["summary"])
-
-    # Tab 4: AI-Generated Insights
-with tab4:
-    st.subheader("AI-Generated Insights")
-    st.write("The insights below are generated using only the data from the selected date range.")
-
-    # Load all indicators
-    all_data = {}
-    for name, filename in indicators.items():
-        file_path = os.path.join(data_dir, filename)
-        if os.path.exists(file_path):
-            data = pd.read_csv(file_path, parse_dates=["date"])
-            data.set_index("date", inplace=True)
-            # Always use quarterly data for the AI insights
-            filtered_data = data.loc[start_date:end_date].resample("Q").mean()  # Quarterly
-            all_data[name] = filtered_data
-
-    # Generate concise summary
-    def generate_summary(all_data):
-        summary_texts = []
-        for name, data in all_data.items():
-            if not data.empty:
-                data_snippet = data.to_csv(index=True)
-                prompt = (
-                    f"Provide a concise analysis of trends in {name} for the period {start_date} to {end_date}, "
-                    f"highlighting major trends, key events, and recent changes. Data:\n{data_snippet}"
-                )
+                    # Plot the comparison
+                    st.write(f"### Comparison of {indicator_1} and {indicator_2}")
+                    if comparison.empty:
+                        st.warning(f"{indicator_1} and {indicator_2} have no dates in common in the selected date range.")
+                    else:
+                        st.altair_chart(
+                            comparison_chart(comparison, f"{indicator_1} vs {indicator_2}", normalized=normalize_data),
+                            width="stretch",
+                        )
+            else:
+                st.error("One or both of the selected data files are missing.")
+
+        # Rolling correlation between the two compared indicators
+        st.subheader("Rolling Correlation")
+        rolling_window = st.slider("Rolling window (months):", min_value=6, max_value=120, value=36, step=6, key="rolling_window")
+        if indicator_1 != indicator_2 and os.path.exists(merged_file_path):
+            correlation_index = load_correlation_index(merged_file_path)
+            if indicator_1 in correlation_index.columns and indicator_2 in correlation_index.columns:
+                rolling_corr = correlation_index.rolling(
+                    indicator_1, indicator_2, rolling_window, start=start_date, end=end_date
+                ).dropna()
+                if rolling_corr.empty:
+                    st.warning(f"Not enough overlapping data for a {rolling_window}-month rolling correlation in the selected date range.")
+                else:
+                    st.write(f"### {rolling_window}-Month Rolling Correlation of {indicator_1} and {indicator_2}")
+                    st.line_chart(downsample_series(rolling_corr), width="stretch")
+
 
+# Tab 4: AI-Generated Insights
+def load_quarterly_data(selected_indicators, start_date, end_date):
+    with span("dashboard.quarterly_data") as current_span:
+        # Load and process the selected indicators
+        all_data = {}
+        for name in selected_indicators:
+            file_path = os.path.join(data_dir, indicators[name])
+            if os.path.exists(file_path):
+                # Quarterly aggregates of the range, read from the precomputed pyramid
+                all_data[name] = resample_range(file_path, "quarterly", start_date, end_date, registry[name].aggregation)
+        current_span.set(indicators=len(all_data), rows=sum(len(data) for data in all_data.values()))
+        return all_data
+
+
+def summary_section(all_data, start_date, end_date):
+    with span("dashboard.summaries", indicators=len(all_data)):
+        # Summaries shown for this selection and date range
+        summary_key = (tuple(all_data), str(start_date), str(end_date))
+
+        # Reload button: regenerate the summaries instead of using cached ones
+        refresh_summary = st.button("Reload Summary")
+        if refresh_summary:
+            st.session_state.summary_cancelled = None
+
+        # Cancel button: clicking it interrupts the running generation (Streamlit
+        # stops the current run), which closes the in-flight requests. Only this
+        # selection and range stay cancelled; changing either generates again.
+        if st.button("Cancel", key="cancel_summary"):
+            st.session_state.summary_cancelled = summary_key
+
+        # Generate Summary. Summaries are cached on disk per indicator, date range and
+        # data, and shared between sessions, so repeated views cost no API calls.
+        # Uncached ones are requested concurrently and streamed in as they arrive.
+        st.subheader("Summary")
+        summary_data = {name: data for name, data in all_data.items() if not data.empty}
+        if not summary_data:
+            st.error("No data available in the selected time range for generating a summary.")
+        elif st.session_state.get("summary_cancelled") == summary_key:
+            st.info("Summary generation was cancelled. Click Reload Summary to try again.")
+        else:
+            placeholders = {name: st.empty() for name in summary_data}
+            summary_texts = {name: "" for name in summary_data}
+            for name, kind, text in stream_summaries(
+                get_client(), summary_data, start_date, end_date, cache=get_summary_cache(), refresh=refresh_summary
+            ):
+                if kind == "chunk":
+                    summary_texts[name] += text
+                elif kind == "done":
+                    summary_texts[name] = text
+                else:
+                    summary_texts[name] = f"An error occurred while generating the summary: {text}"
+                placeholders[name].markdown(f"**{name}:** {summary_texts[name]}")
+
+
+@st.fragment
+def question_section(all_data, start_date, end_date):
+    with span("dashboard.question"):
+        # Q&A Section
+        st.subheader("Ask a Question")
+        if "qa_response" not in st.session_state:
+            st.session_state.qa_response = None  # Store the last response
+        if "qa_question" not in st.session_state:
+            st.session_state.qa_question = ""  # Store the last question
+
+        # Input for question
+        user_question = st.text_input(
+            "Ask a question about the macroeconomic data (in the selected date range):",
+            key="user_question_input"
+        )
+
+        # Handle question submission
+        submitted = st.button("Submit")
+        answered = False
+        if submitted:
+            if user_question.strip() != "":
+                st.session_state.qa_question = user_question  # Update the session state with the new question
+                # Send the new question to GPT-4o and stream the answer into the page
                 try:
-                    response = client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[
-                            {"role": "system", "content": "You are an economic analyst providing concise summaries of data trends."},
-                            {"role": "user", "content": prompt},
-                        ],
-                        temperature=0.7,
-                        max_tokens=250,
-                    )
-                    summary_texts.append(f"**{name}:** {response.choices[0].message.content.strip()}")
+                    answer = st.write_stream(stream_answer(get_client(), user_question, all_data, start_date, end_date))
+                    st.session_state.qa_response = answer.strip()  # Store the response
+                    answered = True
                 except Exception as e:
-                    summary_texts.append(f"**{name}:** An error occurred while generating the summary: {str(e)}")
-        return "\n\n".join(summary_texts)
-
-    # Generate Summary
-    st.subheader("Summary")
-    if all_data:
-        summary = generate_summary(all_data)
-        st.write(summary)
+                    st.session_state.qa_response = f"An error occurred while answering the question: {str(e)}"
+            else:
+                st.error("Please enter a valid question.")
+
+        # Display the latest response (unless it was just streamed above)
+        if st.session_state.qa_response and not answered:
+            st.write(st.session_state.qa_response)
+
+
+# Spans of the sections run below, shown in the performance panel
+with collect() as rerun_spans:
+    if tab1.open:
+        with tab1:
+            time_series_tab(start_date, end_date)
+
+    if tab2.open:
+        with tab2:
+            key_statistics_tab(selected_indicators, start_date, end_date)
+
+    if tab3.open:
+        with tab3:
+            st.subheader("Additional Visualizations")
+            correlation_heatmap_section(selected_indicators, start_date, end_date)
+            comparison_section(start_date, end_date)
+
+    if tab4.open:
+        with tab4:
+            st.subheader("AI-Generated Insights")
+            st.write("The insights below are generated using only the data from the selected date range (quarterly).")
+            all_data = load_quarterly_data(selected_indicators, start_date, end_date)
+
+            # The summaries rerun with the page (sidebar changes, Reload, Cancel);
+            # submitting a question reruns only the Q&A fragment
+            summary_section(all_data, start_date, end_date)
+            question_section(all_data, start_date, end_date)
+
+            # Clicking Cancel while the answer streams stops it. It sits outside the
+            # fragment because a click inside a fragment waits for the running
+            # fragment to finish instead of interrupting it.
+            st.button("Cancel", key="cancel_answer")
+
+# Sidebar: optional performance panel with the breakdown of the last full rerun
+if st.sidebar.checkbox("Show performance panel", value=False, key="show_performance"):
+    st.sidebar.header("Performance")
+    if rerun_spans:
+        breakdown = pd.DataFrame([record.to_dict() for record in rerun_spans]).drop(columns=["start"])
+        st.sidebar.write(f"**Instrumented time:** {breakdown.loc[breakdown['name'].str.startswith('dashboard.'), 'duration_ms'].sum():.0f} ms")
+        st.sidebar.dataframe(breakdown, hide_index=True, width="stretch")
     else:
-        st.error("No data available in the selected time range for generating a summary.")
-
-    # Q&A Section
-    st.subheader("Ask a Question")
-    if "qa_response" not in st.session_state:
-        st.session_state.qa_response = None  # Store the last response
-    if "qa_question" not in st.session_state:
-        st.session_state.qa_question = ""  # Store the last question
-
-    # Input for question
-    user_question = st.text_input(
-        "Ask a question about the macroeconomic data (in the selected date range):",
-        key="user_question_input"
-    )
-
-    # Handle question submission
-    if st.button("Submit"):
-        if user_question.strip() != "":
-            st.session_state.qa_question = user_question  # Update the session state with the new question
-            # Send the new question to GPT-4o
-            all_data_snippet = "\n".join([data.to_csv(index=True) for data in all_data.values()])
-            prompt = (
-                f"Answer the following question using the provided macroeconomic data for the range {start_date} to {end_date} in 8 or less sentences:\n"
-                f"{user_question}\n\nData:\n{all_data_snippet}"
-            )
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "You are an economic analyst answering questions based on provided data."},
-                        {"role": "user", "content": prompt},
-                    ],
-                    temperature=0.7,
-                    max_tokens=300,
-                )
-                st.session_state.qa_response = response.choices[0].message.content.strip()  # Store the response
-            except Exception as e:
-                st.session_state.qa_response = f"An error occurred while answering the question: {str(e)}"
-        else:
-            st.error("Please enter a valid question.")
-
-    # Display the latest response
-    if st.session_state.qa_response:
-        st.write(st.session_state.qa_response)
+        st.sidebar.write("No spans were recorded in the last rerun.")
@@ -0,0 +1,263 @@
+import os
+import threading
+import pandas as pd
+from instrumentation import span
+from shared_dataset import file_hash, find_table, publish_dataset
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Rows per Parquet row group. Smaller groups let range reads skip more data
+# using the per-group date statistics, at the cost of slightly larger files.
+PARQUET_ROW_GROUP_SIZE = 4096
+
+# Process-wide cache of parsed indicator files, keyed by absolute path.
+# Each entry holds the source file's (path, mtime, size, content hash)
+# fingerprint, the date-indexed DataFrame parsed from it and the structures
+# derived from that DataFrame. `_lock` only guards these dicts; files are
+# hashed and parsed under their own lock from `_key_locks`.
+_cache = {}
+_key_locks = {}
+_lock = threading.Lock()
+
+
+def columnar_path(filepath):
+    """
+    Return the path of the Parquet file stored next to the given CSV file.
+    """
+    return os.path.splitext(filepath)[0] + ".parquet"
+
+
+def write_columnar(df, filepath):
+    """
+    Write a DataFrame with a 'date' column to the Parquet file stored next to
+    the given CSV path. Does nothing when pyarrow is not installed.
+    """
+    if not HAS_PYARROW:
+        return None
+
+    save_path = columnar_path(filepath)
+    df.to_parquet(save_path, index=False, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    return save_path
+
+
+def append_columnar(df, filepath):
+    """
+    Append rows with a 'date' column to an existing Parquet copy of the given
+    CSV path. Parquet files are immutable, so the copy is rewritten. Callers
+    should check `has_current_columnar` before changing the CSV; a missing or
+    stale copy must not be appended to, and readers fall back to the CSV.
+    """
+    save_path = columnar_path(filepath)
+    if not HAS_PYARROW or not os.path.exists(save_path):
+        return None
+
+    existing = pd.read_parquet(save_path)
+    combined = pd.concat([existing, df[existing.columns]], ignore_index=True)
+    combined.to_parquet(save_path, index=False, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    return save_path
+
+
+class ColumnarWriter:
+    """
+    Write DataFrame chunks with a 'date' column, in order, to a Parquet file
+    one row group at a time, so the whole table never has to be in memory.
+    """
+
+    def __init__(self, save_path):
+        self.save_path = save_path
+        self.writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.save_path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema), row_group_size=PARQUET_ROW_GROUP_SIZE)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def has_current_columnar(filepath):
+    """
+    Check whether the given CSV path has a Parquet copy that is at least as
+    recent as the CSV itself.
+    """
+    parquet_path = columnar_path(filepath)
+    if not HAS_PYARROW or not os.path.exists(parquet_path):
+        return False
+    return not os.path.exists(filepath) or os.stat(parquet_path).st_mtime_ns >= os.stat(filepath).st_mtime_ns
+
+
+def _source_path(filepath):
+    """
+    Pick the file to read for a dataset: the Parquet copy when it is up to
+    date, otherwise the CSV itself.
+    """
+    return columnar_path(filepath) if has_current_columnar(filepath) else filepath
+
+
+def _parse_file(filepath, columns=None, filters=None):
+    """
+    Parse a cleaned CSV or Parquet file into a DataFrame indexed by date.
+    """
+    if filepath.endswith(".parquet"):
+        if columns is not None:
+            columns = ["date"] + [c for c in columns if c != "date"]
+        df = pd.read_parquet(filepath, columns=columns, filters=filters)
+    else:
+        df = pd.read_csv(filepath, parse_dates=["date"], usecols=None if columns is None else ["date", *columns])
+    df.set_index("date", inplace=True)
+    return df
+
+
+def load_table(filepath):
+    """
+    Load a cleaned data file as a date-indexed DataFrame, parsing it at most
+    once per process.
+
+    `filepath` is the CSV path. When the pipeline has published an
+    up-to-date copy of it to the shared dataset, that copy is mapped instead
+    of parsed, so every process on the host reads the same physical pages.
+    Otherwise its Parquet copy is read when present and up to date. The file
+    is re-parsed only when its modification time or size changes and its
+    content hash differs from the cached one. The returned DataFrame is
+    shared between all callers and must not be modified in place.
+    """
+    with span("data.load", file=os.path.basename(filepath)) as current_span:
+        key = os.path.abspath(filepath)
+        shared = find_table(key)
+        if shared is not None:
+            dataset, name = shared
+            source = os.path.join(dataset.path, name)
+        else:
+            source = _source_path(key)
+        stat = os.stat(key if shared is not None else source)
+
+        with _lock:
+            entry = _cache.get(key)
+            if _is_current(entry, source, stat, shared is not None):
+                current_span.set(cache="hit")
+                return entry["data"]
+            key_lock = _key_locks.setdefault(key, threading.Lock())
+
+        # Hash and parse outside the process-wide lock so that loads of other
+        # files never wait; concurrent misses on this file share one parse
+        with key_lock:
+            with _lock:
+                entry = _cache.get(key)
+            if _is_current(entry, source, stat, shared is not None):
+                current_span.set(cache="hit")
+                return entry["data"]
+
+            if entry is not None and entry["source"] == source:
+                # The file was touched; only re-parse if the contents really changed
+                content_hash = file_hash(source)
+                if content_hash == entry["hash"]:
+                    with _lock:
+                        entry["mtime"], entry["size"] = stat.st_mtime_ns, stat.st_size
+                    current_span.set(cache="hit")
+                    return entry["data"]
+            elif shared is not None:
+                content_hash = dataset.tables[name]["hash"]
+            else:
+                content_hash = file_hash(source)
+
+            if shared is not None:
+                data = dataset.load(name)
+                current_span.set(cache="mapped", rows=len(data))
+            else:
+                data = _parse_file(source)
+                current_span.set(cache="miss", rows=len(data), bytes=stat.st_size)
+            with _lock:
+                _cache[key] = {
+                    "source": source,
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "hash": content_hash,
+                    "data": data,
+                    "derived": {},
+                }
+            return data
+
+
+def _is_current(entry, source, stat, published):
+    # Published versions never change once written
+    if entry is None or entry["source"] != source:
+        return False
+    return published or (entry["mtime"], entry["size"]) == (stat.st_mtime_ns, stat.st_size)
+
+
+def load_derived(filepath, name, builder):
+    """
+    Return `builder(data)` for a cleaned data file, computing it once per
+    version of the file. Derived structures (indexes, pre-aggregations) are
+    dropped together with the DataFrame when the file changes.
+    """
+    data = load_table(filepath)
+    key = os.path.abspath(filepath)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry["data"] is data and name in entry["derived"]:
+            return entry["derived"][name]
+
+    value = builder(data)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry["data"] is data:
+            entry["derived"][name] = value
+    return value
+
+
+def load_indicator(data_dir, filename):
+    """
+    Load a single cleaned indicator file from the given directory.
+    """
+    return load_table(os.path.join(data_dir, filename))
+
+
+def read_range(filepath, start=None, end=None, columns=None):
+    """
+    Read only the rows between `start` and `end` (inclusive) and the requested
+    columns of a cleaned data file, bypassing the process-wide cache.
+
+    With a Parquet copy available the date bounds are pushed down to the
+    reader, so row groups outside the range are never decoded. Otherwise the
+    CSV is parsed and sliced.
+    """
+    source = _source_path(filepath)
+    filters = []
+    if start is not None:
+        filters.append(("date", ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append(("date", "<=", pd.Timestamp(end)))
+
+    if source.endswith(".parquet"):
+        return _parse_file(source, columns=columns, filters=filters or None)
+
+    df = _parse_file(source, columns=columns)
+    return df.loc[start:end]
+
+
+def publish_shared(filepaths, dataset_dir=None):
+    """
+    Publish the given cleaned data files to the shared, memory-mapped
+    dataset read by every dashboard process on the host.
+    """
+    tables = {filepath: _parse_file(_source_path(filepath)) for filepath in filepaths}
+    return publish_dataset(tables, dataset_dir)
+
+
+def clear_cache():
+    """
+    Drop every cached DataFrame.
+    """
+    with _lock:
+        _cache.clear()
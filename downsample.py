@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+from data_loader import load_derived
+
+# Maximum points sent to a chart, about the width in pixels of a full-width chart
+MAX_CHART_POINTS = 1000
+
+# A pyramid level is used for a query when it holds at most this many times
+# the requested points in the range; LTTB then reduces it to the exact count
+LEVEL_OVERSAMPLING = 4
+
+# Levels stop halving once they would hold fewer points than this
+MIN_LEVEL_POINTS = 256
+
+
+# Buckets up to this many points are scanned with Python floats, which is
+# faster than a NumPy call per bucket; larger ones use NumPy
+SCALAR_BUCKET_POINTS = 32
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the positions of the
+    `n_out` points of (x, y) that best preserve the visual shape of the line,
+    always keeping the first and last points.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (n_out - 2)
+
+    # Bucket i spans edges[i]:edges[i + 1]; the averages of every bucket (the
+    # third triangle vertex of the bucket before it) are computed at once
+    edges = np.minimum((np.arange(n_out) * every).astype(np.int64) + 1, n)
+    sizes = np.diff(edges)
+    avg_x = np.add.reduceat(x, edges[:-1]) / sizes
+    avg_y = np.add.reduceat(y, edges[:-1]) / sizes
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    # Each choice depends on the previous one, so the scan over buckets stays sequential
+    a = 0
+    if every <= SCALAR_BUCKET_POINTS:
+        xs, ys, bounds = x.tolist(), y.tolist(), edges.tolist()
+        next_x, next_y = avg_x.tolist(), avg_y.tolist()
+        for i in range(n_out - 2):
+            xa, ya = xs[a], ys[a]
+            dx, dy = xa - next_x[i + 1], next_y[i + 1] - ya
+            best, best_area = bounds[i], -1.0
+            for k in range(bounds[i], bounds[i + 1]):
+                area = abs(dx * (ys[k] - ya) - (xa - xs[k]) * dy)
+                if area > best_area:
+                    best, best_area = k, area
+            a = best
+            selected[i + 1] = a
+    else:
+        for i in range(n_out - 2):
+            start, end = edges[i], edges[i + 1]
+            area = np.abs((x[a] - avg_x[i + 1]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a]))
+            a = start + int(np.argmax(area))
+            selected[i + 1] = a
+
+    return selected
+
+
+def minmax_buckets(y, bucket_size):
+    """
+    Return the sorted positions of the minimum and maximum of every bucket of
+    `bucket_size` consecutive points, which keeps every peak and trough.
+    """
+    n = len(y)
+    padded = np.full(-(-n // bucket_size) * bucket_size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(-1, bucket_size)
+    offsets = np.arange(len(buckets)) * bucket_size
+    lows = offsets + np.nanargmin(buckets, axis=1)
+    highs = offsets + np.nanargmax(buckets, axis=1)
+
+    # Interleave each bucket's two positions in order; buckets are already sorted
+    positions = np.column_stack((np.minimum(lows, highs), np.maximum(lows, highs))).ravel()
+    return positions[np.append(True, positions[1:] != positions[:-1])]
+
+
+class Downsampler:
+    """
+    Multi-level min/max pyramid of a series, built once, that answers
+    "at most N points between two dates" queries with work bounded by N
+    rather than by the number of rows in the range.
+
+    Level 0 is the raw series; level L keeps the min and max of every bucket
+    of 2**(L+1) raw points. A query picks the finest level holding at most
+    LEVEL_OVERSAMPLING * N points in the range and reduces it with LTTB.
+    """
+
+    def __init__(self, series):
+        series = series.dropna()
+        self.name = series.name
+        self.dates = series.index.to_numpy(dtype="datetime64[ns]")
+        self.values = series.to_numpy(dtype=float)
+
+        self.levels = [np.arange(len(self.values))]
+        bucket_size = 4
+        while 2 * len(self.values) // bucket_size >= MIN_LEVEL_POINTS:
+            self.levels.append(minmax_buckets(self.values, bucket_size))
+            bucket_size *= 2
+        self.level_dates = [self.dates[positions] for positions in self.levels]
+
+    def query(self, start=None, end=None, max_points=MAX_CHART_POINTS):
+        """
+        Return at most `max_points` points of the series between start and
+        end (inclusive) as a Series, preserving its visual shape.
+        """
+        lower = None if start is None else np.datetime64(pd.Timestamp(start))
+        upper = None if end is None else np.datetime64(pd.Timestamp(end))
+
+        for positions, dates in zip(self.levels, self.level_dates):
+            i = 0 if lower is None else int(np.searchsorted(dates, lower, side="left"))
+            j = len(dates) if upper is None else int(np.searchsorted(dates, upper, side="right"))
+            if j - i <= LEVEL_OVERSAMPLING * max_points:
+                break
+        selected = positions[i:j]
+
+        # Keep the exact first and last observations of the range
+        first = 0 if lower is None else int(np.searchsorted(self.dates, lower, side="left"))
+        last = len(self.dates) - 1 if upper is None else int(np.searchsorted(self.dates, upper, side="right")) - 1
+        if last < first:
+            selected = selected[:0]
+        elif len(selected) == 0 or selected[0] != first or selected[-1] != last:
+            selected = np.unique(np.concatenate(([first], selected, [last])))
+
+        if len(selected) > max_points:
+            x = self.dates[selected].astype(np.int64).astype(float)
+            selected = selected[lttb(x, self.values[selected], max_points)]
+
+        return pd.Series(
+            self.values[selected],
+            index=pd.DatetimeIndex(self.dates[selected], name="date"),
+            name=self.name,
+        )
+
+
+def downsample_series(series, max_points=MAX_CHART_POINTS):
+    """
+    Reduce a series to at most `max_points` points with LTTB.
+    """
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+    return series.iloc[lttb(x, series.to_numpy(dtype=float), max_points)]
+
+
+def load_downsampler(filepath, column="value"):
+    """
+    Return the Downsampler of a column of a cleaned data file, built once per
+    version of the file.
+    """
+    return load_derived(filepath, f"downsampler:{column}", lambda data: Downsampler(data[column]))
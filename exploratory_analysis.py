@@ -1,18 +1,16 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from correlation_engine import CorrelationIndex
+from data_loader import read_range
 
 # Use a valid seaborn style
 plt.style.use("seaborn-v0_8-whitegrid")
 sns.set(style="whitegrid")
 
-# Load the merged dataset
+# Load the merged dataset (from its columnar copy when available), indexed by date
 merged_file_path = "cleaned_data/merged_indicators.csv"
-data = pd.read_csv(merged_file_path)
-
-# Convert the 'date' column to datetime format and set as index
-data["date"] = pd.to_datetime(data["date"])
-data.set_index("date", inplace=True)
+data = read_range(merged_file_path)
 
 # Normalize data for better visualization
 def normalize_columns(df, columns):
@@ -62,8 +60,8 @@ def plot_correlation_heatmap(df):
     """
     Compute the correlation matrix and display it as a heatmap.
     """
-    # Compute the correlation matrix
-    correlation_matrix = df.corr()
+    # Compute the correlation matrix from prefix sums (pairwise, like df.corr())
+    correlation_matrix = CorrelationIndex(df).corr()
 
     # Plot the heatmap
     plt.figure(figsize=(10, 8))
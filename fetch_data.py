@@ -1,39 +1,148 @@
+import argparse
 import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from instrumentation import span
+from manifest import first_data_date, get_watermark, load_manifest, save_manifest, set_watermark
+from registry import fmp_names, raw_files
 
-# Fetch functions for each indicator
-def fetch_real_gdp(api_key):
+# FMP economic indicators endpoint
+FMP_ECONOMIC_URL = "https://financialmodelingprep.com/api/v4/economic"
+
+# Indicators to fetch (from the catalog in indicators.toml) and their FMP 'name' parameter
+indicators = fmp_names()
+
+# Default fetch settings
+MAX_WORKERS = 8            # Concurrent requests (and pooled keep-alive connections)
+REQUESTS_PER_SECOND = 5.0  # Sustained request rate across all workers
+BURST = 10                 # Requests allowed back-to-back before throttling kicks in
+TIMEOUT = (5, 30)          # (connect, read) timeout in seconds for each request
+MAX_RETRIES = 5            # Retries on timeouts, connection errors, 429 and 5xx
+BACKOFF_BASE = 0.5         # First retry delay in seconds, doubled on each attempt
+BACKOFF_MAX = 30.0         # Upper bound for a single retry delay
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how fast requests are started.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then consume it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size=MAX_WORKERS):
     """
-    Fetch Real GDP data from the FMP API.
+    Create a requests session whose connection pool can keep one keep-alive
+    connection per worker.
     """
-    url = f"https://financialmodelingprep.com/api/v4/economic?name=realGDP&apikey={api_key}"
-    response = requests.get(url)
-    return response.json()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-def fetch_inflation_rate(api_key):
+
+def _retry_delay(attempt, response=None):
     """
-    Fetch Inflation Rate data from the FMP API.
+    Exponential backoff with jitter, honouring a numeric Retry-After header.
     """
-    url = f"https://financialmodelingprep.com/api/v4/economic?name=inflationRate&apikey={api_key}"
-    response = requests.get(url)
-    return response.json()
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
 
-def fetch_unemployment(api_key):
+def fetch_indicator(session, api_key, name, rate_limiter=None, timeout=TIMEOUT, max_retries=MAX_RETRIES, start=None):
     """
-    Fetch Unemployment Rate data from the FMP API.
+    Fetch one economic indicator from the FMP API, retrying with exponential
+    backoff on timeouts, connection errors, 429 and 5xx responses.
+
+    When `start` is given only observations from that date onwards are requested.
     """
-    url = f"https://financialmodelingprep.com/api/v4/economic?name=unemploymentRate&apikey={api_key}"
-    response = requests.get(url)
-    return response.json()
+    with span("pipeline.fetch", indicator=name, incremental=start is not None) as current_span:
+        params = {"name": name, "apikey": api_key}
+        if start is not None:
+            params["from"] = pd.Timestamp(start).strftime("%Y-%m-%d")
+        for attempt in range(max_retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+
+            try:
+                response = session.get(FMP_ECONOMIC_URL, params=params, timeout=timeout)
+            except (requests.Timeout, requests.ConnectionError):
+                if attempt == max_retries:
+                    raise
+                time.sleep(_retry_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                time.sleep(_retry_delay(attempt, response))
+                continue
+
+            response.raise_for_status()
+            data = response.json()
+            current_span.set(rows=len(data), bytes=len(response.content), attempts=attempt + 1)
+            return data
 
-def fetch_federal_funds(api_key):
+
+def fetch_indicators(api_key, names, max_workers=MAX_WORKERS, requests_per_second=REQUESTS_PER_SECOND,
+                     burst=BURST, timeout=TIMEOUT, max_retries=MAX_RETRIES, start_dates=None):
     """
-    Fetch Federal Funds Rate data from the FMP API.
+    Fetch several indicators concurrently over one pooled session.
+
+    `start_dates` optionally maps FMP indicator names to the first date to
+    request. Returns a tuple (results, errors) of dicts keyed by FMP indicator
+    name. A failing indicator is reported in `errors` and does not stop the others.
     """
-    url = f"https://financialmodelingprep.com/api/v4/economic?name=federalFunds&apikey={api_key}"
-    response = requests.get(url)
-    return response.json()
+    rate_limiter = TokenBucket(requests_per_second, burst)
+    start_dates = start_dates or {}
+    results, errors = {}, {}
+
+    with create_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            name: executor.submit(
+                fetch_indicator, session, api_key, name, rate_limiter, timeout, max_retries, start_dates.get(name)
+            )
+            for name in names
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+
+    return results, errors
+
 
 # Save function
 def save_as_csv(data, filename):
@@ -47,39 +156,98 @@ def save_as_csv(data, filename):
     else:
         print(f"No data available for {filename}. File not created.")
 
+def prepend_new_rows(data, filename, watermark):
+    """
+    Add the observations newer than `watermark` to the top of an existing raw
+    CSV file, keeping FMP's newest-first order. The existing rows are copied
+    as raw bytes and never parsed. Returns the new rows as a DataFrame.
+    """
+    df = pd.DataFrame(data)
+    if df.empty:
+        return df
+    df = df[pd.to_datetime(df["date"]) > watermark]
+    if df.empty:
+        return df
+
+    tmp_path = f"{filename}.tmp"
+    with open(filename) as existing, open(tmp_path, "w", newline="") as out:
+        header = existing.readline()
+        columns = header.strip().split(",")
+        out.write(header)
+        df.sort_values(by="date", ascending=False).reindex(columns=columns).to_csv(out, header=False, index=False)
+        shutil.copyfileobj(existing, out)
+    os.replace(tmp_path, filename)
+    return df
+
+def fetch_and_save_all(api_key, data_dir="data/", incremental=True, manifest_path=None):
+    """
+    Fetch every configured indicator concurrently and save each as a CSV file.
+
+    In incremental mode, indicators with a recorded watermark (or an existing
+    raw file) only request observations from their last stored date and the
+    newer rows are added to the existing file. Returns the dict of errors
+    keyed by indicator.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(data_dir, "manifest.json")
+    manifest = load_manifest(manifest_path)
+
+    filenames, watermarks = {}, {}
+    for indicator, filename in raw_files().items():
+        filenames[indicator] = os.path.join(data_dir, filename)
+        if incremental and os.path.exists(filenames[indicator]):
+            watermark = get_watermark(manifest, indicator, "fetched") or first_data_date(filenames[indicator])
+            if watermark is not None:
+                watermarks[indicator] = watermark
+
+    print(f"Fetching {len(indicators)} indicators ({len(watermarks)} incrementally)...")
+    start = time.perf_counter()
+    results, errors = fetch_indicators(
+        api_key,
+        list(indicators.values()),
+        start_dates={indicators[indicator]: watermark for indicator, watermark in watermarks.items()},
+    )
+    print(f"Fetched {len(results)} indicators in {time.perf_counter() - start:.2f}s")
+
+    failed = {}
+    for indicator, api_name in indicators.items():
+        if api_name not in results:
+            print(f"Error fetching {indicator}: {errors[api_name]}")
+            failed[indicator] = errors[api_name]
+            continue
+
+        if indicator in watermarks:
+            new_rows = prepend_new_rows(results[api_name], filenames[indicator], watermarks[indicator])
+            print(f"{len(new_rows)} new observation(s) added to {filenames[indicator]}")
+            newest = pd.to_datetime(new_rows["date"]).max() if not new_rows.empty else watermarks[indicator]
+        else:
+            save_as_csv(results[api_name], filenames[indicator])
+            if not results[api_name]:
+                continue
+            newest = pd.to_datetime(pd.DataFrame(results[api_name])["date"]).max()
+        set_watermark(manifest, indicator, "fetched", newest)
+
+    save_manifest(manifest, manifest_path)
+    return failed
+
 # Main script
 def main():
+    parser = argparse.ArgumentParser(description="Fetch macroeconomic indicators from the FMP API.")
+    parser.add_argument("--full", action="store_true", help="Download the full history instead of only new observations.")
+    args = parser.parse_args()
+
     # Load API key
     api_key = os.getenv("FMP_API_KEY")
     if not api_key:
         print("Error: API key not found. Please set your FMP_API_KEY environment variable.")
         return
 
-    # Create a directory for the data
-    data_dir = "data/"
-    os.makedirs(data_dir, exist_ok=True)
-
-    # Fetch and save Real GDP data
-    print("Fetching Real GDP data...")
-    gdp_data = fetch_real_gdp(api_key)
-    save_as_csv(gdp_data, f"{data_dir}Real_GDP.csv")
-
-    # Fetch and save Inflation Rate data
-    print("Fetching Inflation Rate data...")
-    inflation_data = fetch_inflation_rate(api_key)
-    save_as_csv(inflation_data, f"{data_dir}Inflation_Rate.csv")
-
-    # Fetch and save Unemployment Rate data
-    print("Fetching Unemployment Rate data...")
-    unemployment_data = fetch_unemployment(api_key)
-    save_as_csv(unemployment_data, f"{data_dir}Unemployment_Rate.csv")
+    failed = fetch_and_save_all(api_key, incremental=not args.full)
 
-    # Fetch and save Federal Funds Rate data
-    print("Fetching Federal Funds Rate data...")
-    federal_funds_data = fetch_federal_funds(api_key)
-    save_as_csv(federal_funds_data, f"{data_dir}Federal_Funds_Rate.csv")
-
-    print("\nAll tasks completed successfully!")
+    if failed:
+        print(f"\nCompleted with {len(failed)} failed indicator(s): {', '.join(failed)}")
+    else:
+        print("\nAll tasks completed successfully!")
 
 if __name__ == "__main__":
     main()
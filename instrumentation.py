@@ -0,0 +1,232 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# JSON-lines log of every finished span; off unless SPAN_LOG_PATH names a file.
+# It is appended to synchronously and never rotated, so enable it for profiling
+# sessions and batch runs rather than long-running dashboards.
+SPAN_LOG_PATH = os.getenv("SPAN_LOG_PATH", "")
+
+# Upper bounds (seconds) of the span duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+# Numeric span attributes summed into counters, with their metric names
+COUNTERS = {
+    "rows": "rows_total",
+    "bytes": "bytes_read_total",
+    "prompt_tokens": "llm_prompt_tokens_total",
+    "completion_tokens": "llm_completion_tokens_total",
+}
+
+# Prefix of the exported Prometheus metrics
+METRIC_PREFIX = "macro_dashboard"
+
+# Process-wide aggregates per span name, exported as Prometheus metrics
+_metrics = {}
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+# Lists collecting the spans finished in the current context (e.g. one dashboard rerun)
+_collectors = contextvars.ContextVar("span_collectors", default=())
+
+
+class Span:
+    """
+    A timed operation. Attributes such as rows, bytes and token counts can be
+    added while it runs with set().
+    """
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            **self.attributes,
+        }
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """
+    Time the enclosed block as a span named `name` (e.g. "pipeline.clean").
+    The span is logged, added to the process-wide metrics and to the active
+    collectors when the block exits, also when it raises.
+    """
+    current = Span(name, attributes)
+    start = time.perf_counter()
+    try:
+        yield current
+    except GeneratorExit:
+        # A generator holding the span was closed before it finished
+        current.status = "cancelled"
+        raise
+    except BaseException:
+        # Keep a more specific status (e.g. "cancelled") set by the block
+        if current.status == "ok":
+            current.status = "error"
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _finish(current)
+
+
+def _add_metric(current):
+    with _lock:
+        metric = _metrics.setdefault(current.name, {
+            "count": 0,
+            "errors": 0,
+            "seconds": 0.0,
+            "buckets": [0] * len(DURATION_BUCKETS),
+            "counters": {},
+        })
+        metric["count"] += 1
+        metric["errors"] += current.status == "error"
+        metric["seconds"] += current.duration
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if current.duration <= bound:
+                metric["buckets"][i] += 1
+        for attribute in COUNTERS:
+            value = current.attributes.get(attribute)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric["counters"][attribute] = metric["counters"].get(attribute, 0) + value
+
+
+def _finish(current):
+    _add_metric(current)
+
+    if SPAN_LOG_PATH:
+        line = json.dumps(current.to_dict(), default=str) + "\n"
+        with _log_lock:
+            try:
+                os.makedirs(os.path.dirname(SPAN_LOG_PATH) or ".", exist_ok=True)
+                with open(SPAN_LOG_PATH, "a") as f:
+                    f.write(line)
+            except OSError:
+                pass  # Never let logging break the instrumented code
+
+    for records in _collectors.get():
+        records.append(current)
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Collect the spans finished inside the block, including those of worker
+    threads started with contextvars.copy_context(), into the yielded list.
+    """
+    records = []
+    token = _collectors.set(_collectors.get() + (records,))
+    try:
+        yield records
+    finally:
+        _collectors.reset(token)
+
+
+def add_to_metrics(spans):
+    """
+    Add spans finished in another process (e.g. a pipeline worker, which has
+    already logged them) to the metrics of this process.
+    """
+    for current in spans:
+        _add_metric(current)
+
+
+def metrics_text():
+    """
+    Return the aggregated span metrics in the Prometheus text exposition format.
+    """
+    with _lock:
+        snapshot = {
+            name: {**metric, "buckets": list(metric["buckets"]), "counters": dict(metric["counters"])}
+            for name, metric in sorted(_metrics.items())
+        }
+
+    lines = [
+        f"# HELP {METRIC_PREFIX}_span_duration_seconds Duration of instrumented operations.",
+        f"# TYPE {METRIC_PREFIX}_span_duration_seconds histogram",
+    ]
+    for name, metric in snapshot.items():
+        for bound, count in zip(DURATION_BUCKETS, metric["buckets"]):
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {metric["count"]}')
+        lines.append(f'{METRIC_PREFIX}_span_duration_seconds_sum{{span="{name}"}} {metric["seconds"]:.6f}')
+        lines.append(f'{METRIC_PREFIX}_span_duration_seconds_count{{span="{name}"}} {metric["count"]}')
+
+    lines.append(f"# TYPE {METRIC_PREFIX}_span_errors_total counter")
+    for name, metric in snapshot.items():
+        lines.append(f'{METRIC_PREFIX}_span_errors_total{{span="{name}"}} {metric["errors"]}')
+
+    for attribute, metric_name in COUNTERS.items():
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric_name} counter")
+        for name, metric in snapshot.items():
+            if attribute in metric["counters"]:
+                lines.append(f'{METRIC_PREFIX}_{metric_name}{{span="{name}"}} {metric["counters"][attribute]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path):
+    """
+    Write the metrics to a file, e.g. for the node_exporter textfile collector
+    after a batch run.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(metrics_text())
+    os.replace(tmp_path, path)
+
+
+def reset_metrics():
+    """
+    Drop every aggregated metric.
+    """
+    with _lock:
+        _metrics.clear()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Metrics server of the process, started at most once
+_server = None
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    Serve the metrics at http://host:port/metrics from a background thread.
+    Later calls return the running server.
+    """
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
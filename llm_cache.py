@@ -0,0 +1,151 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Default location (overridable with LLM_CACHE_PATH) and limits of the on-disk cache
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_summaries.sqlite")
+TTL_SECONDS = 7 * 24 * 3600  # Entries older than this are recomputed
+MAX_ENTRIES = 1000           # Least recently used entries beyond this are evicted
+
+
+def make_key(**parts):
+    """
+    Build a cache key from named parts (indicator, date range, data hash,
+    model, prompt, ...).
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Flight:
+    """
+    A computation in progress that other callers can wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SummaryCache:
+    """
+    Persistent SQLite cache of LLM responses with TTL and size-based LRU
+    eviction, plus single-flight deduplication: concurrent callers asking for
+    the same key within one process share a single computation.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        Open a connection for one transaction. The transaction is committed
+        (or rolled back on error) and the connection closed on exit.
+        """
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def get(self, key):
+        """
+        Return the cached value for a key, or None if missing or expired.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE summaries SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value):
+        """
+        Store a value and evict expired and least recently used entries.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            conn.execute("DELETE FROM summaries WHERE created < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM summaries WHERE key NOT IN "
+                "(SELECT key FROM summaries ORDER BY accessed DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def get_or_compute(self, key, compute, refresh=False):
+        """
+        Return the cached value for a key, calling `compute()` on a miss (or
+        when `refresh` is set). Only one caller computes a given key at a time;
+        the others wait for and share its result. Failures are not cached.
+        """
+        if not refresh:
+            value = self.get(key)
+            if value is not None:
+                return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            # Another leader may have finished between the lookup above and now
+            value = None if refresh else self.get(key)
+            if value is None:
+                value = compute()
+                self.set(key, value)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+
+# Process-wide cache shared by all dashboard sessions
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_summary_cache():
+    """
+    Return the process-wide summary cache, creating it on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SummaryCache()
+        return _default_cache
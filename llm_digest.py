@@ -0,0 +1,183 @@
+import itertools
+import os
+import pandas as pd
+
+# Token budgets for the prompts built from digests
+SUMMARY_TOKEN_BUDGET = 300
+QA_TOKEN_BUDGET = 1200
+
+# Detail levels tried in order until a digest fits its token budget:
+# (turning points, recent observations, correlation pairs)
+DETAIL_LEVELS = [(8, 6, 10), (6, 4, 6), (4, 3, 3), (2, 2, 1), (0, 1, 0)]
+
+
+def estimate_tokens(text):
+    """
+    Rough token count for English text and numbers (about 4 characters per token).
+    """
+    return (len(text) + 3) // 4
+
+
+def _fmt(value):
+    return f"{value:,.2f}"
+
+
+def _date(timestamp):
+    return timestamp.strftime("%Y-%m-%d")
+
+
+def turning_points(series, count):
+    """
+    Return the `count` most prominent local peaks and troughs of a series as
+    (date, value, "peak"/"trough") tuples in date order.
+
+    A point's prominence is the smaller of its moves from the neighbouring
+    turning points, so short-lived wiggles rank below major reversals.
+    """
+    if count <= 0 or len(series) < 3:
+        return []
+
+    values = series.to_numpy()
+    diffs = pd.Series(values).diff().to_numpy()[1:]
+    candidates = []
+    direction = 0
+    for i, step in enumerate(diffs):
+        if step == 0:
+            continue
+        sign = 1 if step > 0 else -1
+        if direction and sign != direction:
+            candidates.append(i)  # values[i] ends a run in the previous direction
+        direction = sign
+    if not candidates:
+        return []
+
+    bounds = [0] + candidates + [len(values) - 1]
+    scored = []
+    for position in range(1, len(bounds) - 1):
+        i = bounds[position]
+        prominence = min(abs(values[i] - values[bounds[position - 1]]), abs(values[i] - values[bounds[position + 1]]))
+        kind = "peak" if values[i] > values[bounds[position - 1]] else "trough"
+        scored.append((prominence, i, kind))
+
+    top = sorted(scored, reverse=True)[:count]
+    return [(series.index[i], values[i], kind) for _, i, kind in sorted(top, key=lambda item: item[1])]
+
+
+def series_digest(name, series, frequency="quarterly", turning_point_count=6, recent_count=4):
+    """
+    Summarize one series in a fixed number of lines: range, extrema, mean and
+    volatility, largest period-over-period moves, turning points and the most
+    recent observations. The size does not depend on the series length.
+    """
+    series = series.dropna()
+    if series.empty:
+        return f"{name}: no data."
+
+    first_date, last_date = series.index[0], series.index[-1]
+    first_value, last_value = series.iloc[0], series.iloc[-1]
+    change = last_value - first_value
+    lines = [
+        f"{name} ({frequency}, {_date(first_date)} to {_date(last_date)}, {len(series)} observations)",
+        f"- Start {_fmt(first_value)}, end {_fmt(last_value)}, change {change:+,.2f}"
+        + (f" ({change / abs(first_value):+.1%})" if first_value else ""),
+        f"- Mean {_fmt(series.mean())}, std {_fmt(series.std(ddof=1) if len(series) > 1 else 0.0)}",
+        f"- Max {_fmt(series.max())} ({_date(series.idxmax())}), min {_fmt(series.min())} ({_date(series.idxmin())})",
+    ]
+
+    changes = series.diff().dropna()
+    if not changes.empty:
+        lines.append(
+            f"- Largest rise {changes.max():+,.2f} ({_date(changes.idxmax())}), "
+            f"largest fall {changes.min():+,.2f} ({_date(changes.idxmin())})"
+        )
+
+    points = turning_points(series, turning_point_count)
+    if points:
+        lines.append("- Turning points: " + "; ".join(f"{kind} {_fmt(value)} ({_date(date)})" for date, value, kind in points))
+
+    recent = series.iloc[-recent_count:]
+    lines.append("- Recent: " + "; ".join(f"{_date(date)} {_fmt(value)}" for date, value in recent.items()))
+    if len(changes):
+        lines.append(f"- Latest change {changes.iloc[-1]:+,.2f}")
+    return "\n".join(lines)
+
+
+def correlation_digest(all_series, max_pairs):
+    """
+    List the strongest pairwise correlations between the series, aligned on
+    their shared dates.
+    """
+    if max_pairs <= 0 or len(all_series) < 2:
+        return ""
+
+    aligned = pd.DataFrame(all_series)
+    correlations = []
+    for a, b in itertools.combinations(aligned.columns, 2):
+        r = aligned[a].corr(aligned[b])
+        if pd.notna(r):
+            correlations.append((abs(r), a, b, r))
+    if not correlations:
+        return ""
+
+    strongest = sorted(correlations, reverse=True)[:max_pairs]
+    return "Correlations: " + "; ".join(f"{a} / {b} {r:+.2f}" for _, a, b, r in strongest)
+
+
+def _column(data):
+    return data["value"] if isinstance(data, pd.DataFrame) else data
+
+
+def build_digest(all_data, token_budget=QA_TOKEN_BUDGET, frequency="quarterly"):
+    """
+    Build a digest of several indicators (name -> DataFrame with a 'value'
+    column, or Series) that fits within `token_budget`, lowering the level of
+    detail until it does.
+    """
+    all_series = {name: _column(data).dropna() for name, data in all_data.items()}
+    all_series = {name: series for name, series in all_series.items() if not series.empty}
+
+    digest = ""
+    for turning_point_count, recent_count, pair_count in DETAIL_LEVELS:
+        parts = [
+            series_digest(name, series, frequency, turning_point_count, recent_count)
+            for name, series in all_series.items()
+        ]
+        correlations = correlation_digest(all_series, pair_count)
+        if correlations:
+            parts.append(correlations)
+        digest = "\n\n".join(parts)
+        if estimate_tokens(digest) <= token_budget:
+            break
+    return digest
+
+
+def prompt_size_report(all_data, token_budget=QA_TOKEN_BUDGET):
+    """
+    Compare the estimated token count of the raw CSV data with the digest.
+    """
+    csv_tokens = sum(estimate_tokens(data.to_csv(index=True)) for data in all_data.values())
+    digest_tokens = estimate_tokens(build_digest(all_data, token_budget))
+    return {
+        "csv_tokens": csv_tokens,
+        "digest_tokens": digest_tokens,
+        "reduction": 1 - digest_tokens / csv_tokens if csv_tokens else 0.0,
+    }
+
+
+def main():
+    from pyramid import resample_range
+    from registry import load_registry
+
+    # Measure prompt sizes for the full history of every indicator, quarterly
+    all_data = {}
+    for name, indicator in load_registry().items():
+        all_data[name] = resample_range(os.path.join("cleaned_data/", indicator.cleaned_file), "quarterly", how=indicator.aggregation)
+
+    for name, data in all_data.items():
+        report = prompt_size_report({name: data}, SUMMARY_TOKEN_BUDGET)
+        print(f"{name}: {report['csv_tokens']} CSV tokens -> {report['digest_tokens']} digest tokens ({report['reduction']:.0%} smaller)")
+    report = prompt_size_report(all_data, QA_TOKEN_BUDGET)
+    print(f"All indicators: {report['csv_tokens']} CSV tokens -> {report['digest_tokens']} digest tokens ({report['reduction']:.0%} smaller)")
+
+if __name__ == "__main__":
+    main()
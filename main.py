@@ -1,11 +1,5 @@
 import os
-from fetch_data import (
-    fetch_real_gdp,
-    fetch_inflation_rate,
-    fetch_unemployment,
-    fetch_federal_funds,
-    save_as_csv,
-)
+from fetch_data import fetch_and_save_all
 
 def main():
     """
@@ -17,28 +11,13 @@ def main():
         print("Error: API key not found. Please set your FMP_API_KEY environment variable.")
         return
 
-    # Create a directory for saving the data
-    data_dir = "data/"
-    os.makedirs(data_dir, exist_ok=True)
+    # Fetch all indicators concurrently and save them to the data directory
+    failed = fetch_and_save_all(api_key, data_dir="data/")
 
-    # Fetch and save data for each indicator
-    print("Fetching Real GDP data...")
-    gdp_data = fetch_real_gdp(api_key)
-    save_as_csv(gdp_data, f"{data_dir}Real_GDP.csv")
-
-    print("Fetching Inflation Rate data...")
-    inflation_data = fetch_inflation_rate(api_key)
-    save_as_csv(inflation_data, f"{data_dir}Inflation_Rate.csv")
-
-    print("Fetching Unemployment Rate data...")
-    unemployment_data = fetch_unemployment(api_key)
-    save_as_csv(unemployment_data, f"{data_dir}Unemployment_Rate.csv")
-
-    print("Fetching Federal Funds Rate data...")
-    federal_funds_data = fetch_federal_funds(api_key)
-    save_as_csv(federal_funds_data, f"{data_dir}Federal_Funds_Rate.csv")
-
-    print("\nData fetching and saving completed successfully!")
+    if failed:
+        print(f"\nData fetching completed with {len(failed)} failed indicator(s): {', '.join(failed)}")
+    else:
+        print("\nData fetching and saving completed successfully!")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import pandas as pd
+
+# Manifest recording, for every indicator, the last date stored by each
+# pipeline stage ("fetched", "cleaned", "merged"), and a digest of the raw
+# rows behind each cleaned file
+MANIFEST_PATH = "data/manifest.json"
+
+# Bytes hashed at a time when computing a raw history digest
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Load the watermark manifest, returning an empty one if it does not exist.
+    """
+    if not os.path.exists(path):
+        return {"watermarks": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """
+    Atomically write the watermark manifest.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def get_watermark(manifest, indicator, stage):
+    """
+    Return the last date stored for an indicator by a stage, or None.
+    """
+    value = manifest["watermarks"].get(indicator, {}).get(stage)
+    return pd.Timestamp(value) if value else None
+
+
+def set_watermark(manifest, indicator, stage, date):
+    """
+    Record the last date stored for an indicator by a stage.
+    """
+    manifest["watermarks"].setdefault(indicator, {})[stage] = pd.Timestamp(date).strftime("%Y-%m-%d")
+
+
+def clear_watermark(manifest, indicator, stage):
+    """
+    Forget the last date stored for an indicator by a stage, so that the
+    stage rebuilds it in full on its next run.
+    """
+    manifest["watermarks"].get(indicator, {}).pop(stage, None)
+
+
+def raw_history(filepath):
+    """
+    Return the size and hash of the data rows of a raw file, i.e. everything
+    after the header line.
+    """
+    with open(filepath, "rb") as f:
+        header_size = len(f.readline())
+    size = os.path.getsize(filepath) - header_size
+    return {"bytes": size, "hash": _tail_hash(filepath, size)}
+
+
+def history_unchanged(filepath, history):
+    """
+    Check that the rows recorded by raw_history are still the oldest rows of
+    a raw file. New observations are added to the top of newest-first raw
+    files, so the recorded rows must still end the file byte for byte; any
+    revision of the history changes their hash.
+    """
+    if not history or os.path.getsize(filepath) < history["bytes"]:
+        return False
+    return _tail_hash(filepath, history["bytes"]) == history["hash"]
+
+
+def get_history(manifest, indicator):
+    """
+    Return the raw history recorded when an indicator was last cleaned, or None.
+    """
+    return manifest.get("history", {}).get(indicator)
+
+
+def set_history(manifest, indicator, history):
+    """
+    Record the raw history an indicator was cleaned from.
+    """
+    manifest.setdefault("history", {})[indicator] = history
+
+
+def _tail_hash(filepath, size):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        f.seek(os.path.getsize(filepath) - size)
+        while size > 0:
+            block = f.read(min(HASH_BLOCK_SIZE, size))
+            if not block:
+                break
+            digest.update(block)
+            size -= len(block)
+    return digest.hexdigest()
+
+
+def first_data_date(filepath):
+    """
+    Return the date on the first data row of a CSV file (the newest row of a
+    raw FMP file), or None for a missing or empty file.
+    """
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath) as f:
+        f.readline()
+        line = f.readline().strip()
+    return pd.Timestamp(line.split(",", 1)[0]) if line else None
+
+
+def last_data_date(filepath):
+    """
+    Return the date on the last data row of a CSV file (the newest row of a
+    cleaned file) by reading only the end of the file, or None.
+    """
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 4096))
+        lines = f.read().decode().strip().splitlines()
+    if len(lines) < 2 and size <= 4096:
+        return None  # Header only
+    return pd.Timestamp(lines[-1].split(",", 1)[0])
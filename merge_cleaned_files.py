@@ -1,17 +1,20 @@
+import argparse
 import os
+import time
+import numpy as np
 import pandas as pd
+from data_loader import read_range, write_columnar
+from instrumentation import span
+from manifest import get_watermark, last_data_date, load_manifest, save_manifest, set_watermark
+from parallel import run_tasks
+from registry import cleaned_files
 
 # Directory containing cleaned files
 cleaned_data_dir = "cleaned_data/"
 merged_file_path = "cleaned_data/merged_indicators.csv"
 
-# List of cleaned files and their corresponding indicators
-indicators = {
-    "Real GDP": "cleaned_Real_GDP.csv",
-    "Inflation Rate": "cleaned_Inflation_Rate.csv",
-    "Unemployment Rate": "cleaned_Unemployment_Rate.csv",
-    "Federal Funds Rate": "cleaned_Federal_Funds_Rate.csv",
-}
+# List of cleaned files and their corresponding indicators (from the catalog in indicators.toml)
+indicators = cleaned_files()
 
 def resample_to_monthly(df, date_column="date", method="ffill"):
     """
@@ -28,57 +31,262 @@ def resample_to_monthly(df, date_column="date", method="ffill"):
 
     # Resample to monthly frequency
     if method == "ffill":
-        df = df.resample("M").ffill()  # Forward-fill missing values
+        df = df.resample("ME").ffill()  # Forward-fill missing values
     elif method == "linear":
-        df = df.resample("M").interpolate(method="linear")  # Linear interpolation
+        # Interpolate in time between the observations, then keep the month ends;
+        # resampling first would drop every observation not on a month end
+        month_ends = pd.date_range(
+            df.index.min().normalize() + pd.offsets.MonthEnd(0),
+            df.index.max().normalize() + pd.offsets.MonthEnd(0),
+            freq="ME",
+            name=date_column,
+        )
+        df = df.sort_index().reindex(df.index.union(month_ends)).interpolate(method="time").loc[month_ends]
     else:
         raise ValueError(f"Unsupported resampling method: {method}")
 
     return df.reset_index()
 
 
-def merge_cleaned_files(indicators, cleaned_data_dir, save_path):
+def _month_codes(dates):
     """
-    Merge cleaned files into a single DataFrame with monthly frequency.
+    Convert dates to integer month numbers counted from January 1970.
     """
-    merged_df = None
+    return np.asarray(dates, dtype="datetime64[M]").astype(np.int64)
 
-    for indicator, filename in indicators.items():
-        filepath = os.path.join(cleaned_data_dir, filename)
-        if os.path.exists(filepath):
-            print(f"Loading and resampling data for {indicator}...")
-            df = pd.read_csv(filepath)
 
-            # Rename 'value' column to the indicator name for clarity
-            df.rename(columns={"value": indicator}, inplace=True)
+def _month_ends(first_code, periods):
+    """
+    Build the month-end DatetimeIndex for `periods` months starting at a month number.
+    """
+    first_month_end = pd.Timestamp(np.datetime64(int(first_code), "M")) + pd.offsets.MonthEnd(0)
+    return pd.date_range(first_month_end, periods=periods, freq="ME", name="date")
+
+
+def _monthly_ffill(dates, values):
+    """
+    Vectorized equivalent of resample("ME").ffill() for sorted, unique dates:
+    each month end takes the last observation on or before it. Returns the
+    first month number and the dense array of monthly values.
+    """
+    codes = _month_codes(dates)
+
+    # Last observation of every month that has one
+    is_last = np.append(codes[1:] != codes[:-1], True)
+    month_codes, month_values = codes[is_last], values[is_last]
+
+    # Spread them over every month of the series' range, carrying values forward
+    first_code = month_codes[0]
+    positions = np.full(month_codes[-1] - first_code + 1, -1)
+    positions[month_codes - first_code] = np.arange(len(month_codes))
+    positions = np.maximum.accumulate(positions)
+    return first_code, month_values[positions]
+
+
+def align_monthly(series, method="ffill"):
+    """
+    Align several date-indexed series onto one shared month-end index in a
+    single pass.
+
+    Each series is reduced to its own monthly range and written into a
+    preallocated matrix covering the union of all ranges; months outside a
+    series' range stay NaN, as with an outer merge.
+    """
+    monthly = {}
+    for name, s in series.items():
+        if s.empty:
+            continue
+
+        # Drop duplicate dates (keeping the first) and sort, as resample_to_monthly
+        # does; cleaned files are already strictly increasing, so this is usually skipped
+        dates = s.index.to_numpy()
+        if not (dates[1:] > dates[:-1]).all():
+            s = s[~s.index.duplicated(keep="first")].sort_index(kind="stable")
+            dates = s.index.to_numpy()
+
+        if method == "ffill":
+            monthly[name] = _monthly_ffill(dates, s.to_numpy(dtype=float))
+        else:
+            resampled = resample_to_monthly(s.rename(name).reset_index(), date_column=s.index.name or "index", method=method)
+            values = resampled[name].to_numpy(dtype=float)
+            monthly[name] = (_month_codes(pd.DatetimeIndex(resampled.iloc[:, 0]))[0], values)
+
+    if not monthly:
+        return None
+
+    first_code = min(code for code, _ in monthly.values())
+    last_code = max(code + len(values) - 1 for code, values in monthly.values())
+    matrix = np.full((last_code - first_code + 1, len(monthly)), np.nan)
+    for column, (code, values) in enumerate(monthly.values()):
+        offset = code - first_code
+        matrix[offset:offset + len(values), column] = values
+
+    return pd.DataFrame(matrix, index=_month_ends(first_code, len(matrix)), columns=list(monthly))
 
-            # Debug: Check for duplicate dates before resampling
-            duplicate_dates = df["date"].duplicated().sum()
-            if duplicate_dates > 0:
-                print(f"Warning: {duplicate_dates} duplicate dates found in {indicator}. Fixing...")
 
-            # Resample to monthly frequency
-            df = resample_to_monthly(df, date_column="date", method="ffill")
+def load_monthly(indicator, filepath, method="ffill"):
+    """
+    Load one cleaned series and resample it to month ends. Returns the
+    monthly Series, or None when the file has no rows.
+    """
+    print(f"Loading data for {indicator}...")
+    df = read_range(filepath, columns=["value"])
+
+    # Debug: Check for duplicate dates before resampling
+    duplicate_dates = df.index.duplicated().sum()
+    if duplicate_dates > 0:
+        print(f"Warning: {duplicate_dates} duplicate dates found in {indicator}. Fixing...")
+
+    monthly_df = align_monthly({indicator: df["value"]}, method=method)
+    return monthly_df[indicator] if monthly_df is not None else None
+
+
+def merge_cleaned_files(indicators, cleaned_data_dir, save_path, jobs=None):
+    """
+    Merge cleaned files into a single DataFrame with monthly frequency.
+    Series are loaded and resampled by `jobs` worker processes, then merged
+    once. Returns the time spent in each stage, in seconds.
+    """
+    with span("pipeline.merge") as current_span:
+        timings = {}
 
-            # Merge with the combined DataFrame
-            if merged_df is None:
-                merged_df = df  # Initialize with the first DataFrame
+        # Load and resample every series to monthly frequency
+        stage_start = time.perf_counter()
+        tasks = {}
+        for indicator, filename in indicators.items():
+            filepath = os.path.join(cleaned_data_dir, filename)
+            if os.path.exists(filepath):
+                tasks[indicator] = (load_monthly, (indicator, filepath))
             else:
-                merged_df = pd.merge(merged_df, df, on="date", how="outer")
+                print(f"File not found: {filepath}")
+        outcomes = run_tasks(tasks, jobs)
+        failures = {indicator: outcome["error"] for indicator, outcome in outcomes.items() if outcome["error"] is not None}
+        if failures:
+            raise ValueError("Could not load " + "; ".join(f"{indicator}: {error}" for indicator, error in failures.items()))
+        series = {
+            indicator: outcome["result"] for indicator, outcome in outcomes.items() if outcome["result"] is not None
+        }
+        timings["resample"] = time.perf_counter() - stage_start
+
+        # Assemble the wide table from the monthly series
+        stage_start = time.perf_counter()
+        merged_df = align_monthly(series, method="ffill")
+        timings["align"] = time.perf_counter() - stage_start
+
+        if merged_df is not None:
+            stage_start = time.perf_counter()
+            merged_df = merged_df.reset_index()
+            merged_df.to_csv(save_path, index=False)
+            current_span.set(rows=len(merged_df), indicators=len(series))
+            print(f"Merged data saved to {save_path}")
+
+            # Save a columnar copy for fast, range-sliced reads
+            columnar_save_path = write_columnar(merged_df, save_path)
+            if columnar_save_path:
+                print(f"Columnar copy saved to {columnar_save_path}")
+            timings["write"] = time.perf_counter() - stage_start
         else:
-            print(f"File not found: {filepath}")
+            print("No files were merged.")
+
+        print("Merge timings: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items()))
+        return timings
+
 
-    # Sort the merged DataFrame by date
-    if merged_df is not None:
-        merged_df.sort_values(by="date", inplace=True)
+def write_monthly_column(indicator, cleaned_path, save_path, method="ffill"):
+    """
+    Resample one cleaned series to month ends and save it as a single-column
+    file, so that the merge can reuse it while the series is unchanged.
+    """
+    with span("pipeline.resample", indicator=indicator) as current_span:
+        df = read_range(cleaned_path, columns=["value"])
+        current_span.set(rows=len(df))
+        monthly_df = align_monthly({indicator: df["value"]}, method=method)
+        if monthly_df is None:
+            raise ValueError(f"No data to resample in {cleaned_path}")
+        monthly_df.reset_index().to_csv(save_path, index=False)
+        return monthly_df
+
+
+def merge_monthly_columns(column_paths, save_path):
+    """
+    Assemble monthly columns written by write_monthly_column, given as a dict
+    of indicator to file path, into the merged file.
+    """
+    with span("pipeline.merge", indicators=len(column_paths)) as current_span:
+        series = {
+            indicator: pd.read_csv(path, parse_dates=["date"], index_col="date")[indicator]
+            for indicator, path in column_paths.items()
+        }
+        merged_df = align_monthly(series).reset_index()
+        current_span.set(rows=len(merged_df))
         merged_df.to_csv(save_path, index=False)
+        write_columnar(merged_df, save_path)
         print(f"Merged data saved to {save_path}")
-    else:
-        print("No files were merged.")
+        return merged_df
+
+
+def update_merged_file(indicators, cleaned_data_dir, save_path, manifest):
+    """
+    Bring an existing merged file up to date with the cleaned rows added since
+    the last merge. Only the months touched by new observations are resampled.
+    """
+    with span("pipeline.merge", incremental=True) as current_span:
+        merged_df = pd.read_csv(save_path, parse_dates=["date"]).set_index("date")
+        updated = False
+
+        for indicator, filename in indicators.items():
+            filepath = os.path.join(cleaned_data_dir, filename)
+            merged_watermark = get_watermark(manifest, indicator, "merged")
+            cleaned_watermark = get_watermark(manifest, indicator, "cleaned") or last_data_date(filepath)
+            if cleaned_watermark is None or cleaned_watermark <= merged_watermark:
+                continue
+
+            # Include the last merged observation so that the months between it
+            # and the first new observation are forward-filled as in a full merge
+            print(f"Resampling new data for {indicator} after {merged_watermark.date()}...")
+            df = read_range(filepath, start=merged_watermark, columns=["value"]).reset_index()
+            df.rename(columns={"value": indicator}, inplace=True)
+            df = resample_to_monthly(df, date_column="date", method="ffill").set_index("date")
+
+            merged_df = merged_df.reindex(merged_df.index.union(df.index))
+            merged_df.loc[df.index, indicator] = df[indicator]
+            set_watermark(manifest, indicator, "merged", cleaned_watermark)
+            updated = True
+
+        if updated:
+            merged_df.index.name = "date"
+            merged_df = merged_df.reset_index()
+            current_span.set(rows=len(merged_df))
+            merged_df.to_csv(save_path, index=False)
+            write_columnar(merged_df, save_path)
+            print(f"Merged data updated in {save_path}")
+        else:
+            print("Merged data is already up to date.")
 
 
 def main():
-    merge_cleaned_files(indicators, cleaned_data_dir, merged_file_path)
+    parser = argparse.ArgumentParser(description="Merge cleaned indicator files into one monthly table.")
+    parser.add_argument("--full", action="store_true", help="Rebuild the merged file instead of only adding new observations.")
+    parser.add_argument("--jobs", type=int, help="Worker processes resampling series in parallel for --full (0 for one per CPU).")
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    incremental = (
+        not args.full
+        and os.path.exists(merged_file_path)
+        and all(get_watermark(manifest, indicator, "merged") is not None for indicator in indicators)
+    )
+
+    if incremental:
+        update_merged_file(indicators, cleaned_data_dir, merged_file_path, manifest)
+    else:
+        merge_cleaned_files(indicators, cleaned_data_dir, merged_file_path, args.jobs)
+        for indicator, filename in indicators.items():
+            newest = last_data_date(os.path.join(cleaned_data_dir, filename))
+            if newest is not None:
+                set_watermark(manifest, indicator, "merged", newest)
+
+    save_manifest(manifest)
 
 if __name__ == "__main__":
     main()
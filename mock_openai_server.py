@@ -0,0 +1,251 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words cycled through to build deterministic responses
+WORDS = (
+    "growth remained steady while inflation eased and the labor market cooled as policy rates "
+    "stayed restrictive before easing late in the period"
+).split()
+
+
+class MockSettings:
+    """
+    Behaviour of the stand-in server.
+
+    latency: seconds before the first token (or the full response)
+    tokens_per_second: generation speed once the response starts
+    response_tokens: tokens per response, capped by the request's max_tokens
+    error_rate: probability of answering with a 500 error
+    rate_limit_rate: probability of answering with a 429 error
+    retry_after: Retry-After header (seconds) sent with 429 responses
+    """
+
+    def __init__(self, latency=0.5, tokens_per_second=50.0, response_tokens=120,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+
+class MockStats:
+    """
+    Thread-safe request counters, by HTTP status.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.streamed = 0
+        self.by_status = {}
+
+    def record(self, status, stream):
+        with self.lock:
+            self.requests += 1
+            self.streamed += int(stream)
+            self.by_status[status] = self.by_status.get(status, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "streamed": self.streamed, "by_status": dict(self.by_status)}
+
+
+def _handler(settings, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o", "object": "model", "owned_by": "mock"}]})
+            elif self.path.rstrip("/") == "/stats":
+                self._send_json(200, stats.snapshot())
+            else:
+                self._send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            stream = bool(request.get("stream"))
+            model = request.get("model", "gpt-4o")
+
+            with stats.lock:
+                roll = settings.random.random()
+            if roll < settings.rate_limit_rate:
+                stats.record(429, stream)
+                self._send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                    headers={"Retry-After": str(settings.retry_after)},
+                )
+                return
+            if roll < settings.rate_limit_rate + settings.error_rate:
+                stats.record(500, stream)
+                self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                return
+
+            prompt_tokens = sum(len(str(m.get("content", ""))) for m in request.get("messages", [])) // 4
+            completion_tokens = min(settings.response_tokens, request.get("max_tokens") or settings.response_tokens)
+            words = [word for word, _ in zip(itertools.cycle(WORDS), range(completion_tokens))]
+            token_delay = 1.0 / settings.tokens_per_second if settings.tokens_per_second > 0 else 0.0
+            created = int(time.time())
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+            stats.record(200, stream)
+            time.sleep(settings.latency)
+
+            if not stream:
+                time.sleep(token_delay * completion_tokens)
+                self._send_json(200, {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(words)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for i, word in enumerate(words):
+                    chunk = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word if i == 0 else f" {word}"}, "finish_reason": None}],
+                    }
+                    self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                    time.sleep(token_delay)
+                final = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                self._send_chunk(f"data: {json.dumps(final)}\n\n".encode())
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    usage_chunk = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [],
+                        "usage": usage,
+                    }
+                    self._send_chunk(f"data: {json.dumps(usage_chunk)}\n\n".encode())
+                self._send_chunk(b"data: [DONE]\n\n")
+                self._send_chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client cancelled the stream
+
+    return Handler
+
+
+class MockOpenAIServer:
+    """
+    Local OpenAI-compatible chat completions server. Point a client at it
+    with OpenAI(base_url=server.base_url) or the OPENAI_BASE_URL variable.
+    """
+
+    def __init__(self, settings=None, host="127.0.0.1", port=0):
+        self.settings = settings or MockSettings()
+        self.stats = MockStats()
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self.settings, self.stats))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible chat completions stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500 response.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of a 429 response.")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    server = MockOpenAIServer(settings, host=args.host, port=args.port)
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    print(f"Run the dashboard with OPENAI_BASE_URL={server.base_url} OPENAI_API_KEY=mock")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
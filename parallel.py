@@ -0,0 +1,119 @@
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import add_to_metrics, collect
+
+# Worker processes used when --jobs is not given; 0 means one per CPU
+DEFAULT_JOBS = int(os.getenv("PIPELINE_JOBS", "1"))
+
+
+def resolve_jobs(jobs):
+    """
+    Turn a --jobs value into a number of worker processes (0 for one per CPU).
+    """
+    jobs = DEFAULT_JOBS if jobs is None else jobs
+    return (os.cpu_count() or 1) if jobs <= 0 else jobs
+
+
+def call(function, args=(), capture=False):
+    """
+    Run `function(*args)` and return a dict with its result or error message,
+    its duration and the id of the process that ran it. With `capture`, the
+    printed output and the finished spans are returned too, so that the
+    parent process can replay them in a deterministic order.
+    """
+    output, errors = io.StringIO(), io.StringIO()
+    start = time.perf_counter()
+    outcome = {"result": None, "error": None, "worker": os.getpid()}
+    with contextlib.ExitStack() as stack:
+        spans = stack.enter_context(collect())
+        if capture:
+            stack.enter_context(contextlib.redirect_stdout(output))
+            stack.enter_context(contextlib.redirect_stderr(errors))
+        try:
+            outcome["result"] = function(*args)
+        except Exception as e:
+            outcome["error"] = str(e) or type(e).__name__
+
+    outcome["seconds"] = time.perf_counter() - start
+    if capture:
+        outcome["output"] = output.getvalue()
+        outcome["stderr"] = errors.getvalue()
+        outcome["spans"] = spans
+    return outcome
+
+
+def make_pool(jobs):
+    """
+    Create a process pool with `jobs` workers, or return None to run in the
+    current process when a single job is requested.
+    """
+    return ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+
+
+def replay(outcome, stream=None):
+    """
+    Print the output captured in a worker (to `stream`, standard output by
+    default) and add its spans to the metrics of this process.
+    """
+    print(outcome.get("output", ""), end="", file=stream or sys.stdout)
+    print(outcome.get("stderr", ""), end="", file=sys.stderr)
+    add_to_metrics(outcome.get("spans", ()))
+
+
+def run_tasks(tasks, jobs=None, stream=None):
+    """
+    Run {key: (function, args)} tasks, fanned out over `jobs` worker
+    processes, and return {key: outcome} in the order of `tasks`.
+
+    The output of each task is printed in that order as well, once every task
+    before it has finished, so the log does not depend on scheduling. A task
+    raising an exception does not stop the others; its message is recorded
+    in the outcome's "error". Captured output is printed to `stream`
+    (standard output by default).
+    """
+    jobs = resolve_jobs(jobs)
+    outcomes = {}
+    pool = make_pool(min(jobs, len(tasks)))
+    if pool is None:
+        for key, (function, args) in tasks.items():
+            outcomes[key] = call(function, args)
+        return outcomes
+
+    with pool:
+        futures = {key: pool.submit(call, function, args, True) for key, (function, args) in tasks.items()}
+        for key, future in futures.items():
+            outcomes[key] = future.result()
+            replay(outcomes[key], stream)
+    return outcomes
+
+
+def report_outcomes(outcomes, wall_seconds=None, stream=None):
+    """
+    Print the errors of failed tasks and the time spent by every worker
+    process to `stream` (standard error by default, so that it never mixes
+    with machine-readable output), and return {key: error message} of the
+    failed tasks.
+    """
+    stream = stream or sys.stderr
+    failures = {key: outcome["error"] for key, outcome in outcomes.items() if outcome["error"] is not None}
+    if failures:
+        print(f"\n{len(failures)} of {len(outcomes)} failed:", file=stream)
+        for key, error in failures.items():
+            print(f"  {key}: {error}", file=stream)
+
+    workers = {}
+    for outcome in outcomes.values():
+        tasks, seconds = workers.get(outcome["worker"], (0, 0.0))
+        workers[outcome["worker"]] = (tasks + 1, seconds + outcome["seconds"])
+
+    header = f"\nWorker timings ({len(workers)} process(es)"
+    print(header + (f", wall {wall_seconds:.2f}s):" if wall_seconds is not None else "):"), file=stream)
+    for worker, (tasks, seconds) in sorted(workers.items()):
+        print(f"  pid {worker}: {tasks} task(s), busy {seconds:.2f}s", file=stream)
+    slowest = sorted(outcomes.items(), key=lambda item: item[1]["seconds"], reverse=True)[:5]
+    print("Slowest: " + ", ".join(f"{key} {outcome['seconds']:.2f}s" for key, outcome in slowest), file=stream)
+    return failures
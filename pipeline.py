@@ -0,0 +1,383 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from functools import partial
+from clean_data import clean_csv, clean_csv_streaming
+from data_loader import publish_shared
+from fetch_data import fetch_and_save_all
+from instrumentation import write_metrics
+from manifest import clear_watermark, last_data_date, load_manifest, raw_history, save_manifest, set_history, set_watermark
+from merge_cleaned_files import merge_monthly_columns, write_monthly_column
+from parallel import call, make_pool, replay, report_outcomes, resolve_jobs
+from pyramid import build_pyramid, pyramid_levels, pyramid_path
+from registry import load_registry
+from shared_dataset import DATASET_DIR, POINTER_FILE
+from validate_data import validate_csv
+
+# Directory paths
+raw_data_dir = "data/"
+cleaned_data_dir = "cleaned_data/"
+monthly_data_dir = "cleaned_data/monthly/"
+merged_file_path = "cleaned_data/merged_indicators.csv"
+
+# Fingerprints of the last successful run of every stage
+STATE_PATH = "cleaned_data/.pipeline_state.json"
+
+
+class Stage:
+    """
+    A pipeline step with the files it reads and writes, the parameters that
+    affect its output, and the stages that must run before it.
+
+    The action may run in a worker process, so it must be picklable (a
+    module-level function or a functools.partial of one). `finish`, when
+    given, is called in the pipeline process with the action's return value,
+    for bookkeeping shared by every stage such as the watermark manifest.
+    """
+
+    def __init__(self, name, action, inputs=(), outputs=(), params=None, deps=(), always_run=False, finish=None):
+        self.name = name
+        self.action = action
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.deps = list(deps)
+        self.always_run = always_run
+        self.finish = finish
+
+
+class Fingerprinter:
+    """
+    Content hashes of input files, reusing the hash recorded in the previous
+    run while a file's size and modification time are unchanged.
+    """
+
+    def __init__(self, previous):
+        self.previous = previous
+        self.current = {}
+
+    def file_hash(self, path):
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self.previous.get(key)
+        if cached and (cached["mtime"], cached["size"]) == (stat.st_mtime_ns, stat.st_size):
+            digest = cached["hash"]
+        else:
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+            digest = sha.hexdigest()
+        self.current[key] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": digest}
+        return digest
+
+    def stage(self, stage):
+        """
+        Fingerprint a stage from its parameters and the contents of its inputs.
+        """
+        payload = {
+            "params": stage.params,
+            "inputs": {path: self.file_hash(path) for path in stage.inputs},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    """
+    Load the fingerprints recorded by the previous run.
+    """
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    """
+    Atomically write the fingerprints of this run.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def topological_order(stages):
+    """
+    Order stages so that every stage comes after its dependencies, keeping
+    the declaration order otherwise.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    ordered, visiting, done = [], set(), set()
+
+    def visit(stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Dependency cycle at stage {stage.name}")
+        visiting.add(stage.name)
+        for dep in stage.deps:
+            visit(by_name[dep])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def run_stages(stages, state_path=STATE_PATH, force=False, jobs=None):
+    """
+    Run the stages in dependency order, skipping every stage whose inputs and
+    parameters match the last successful run and whose outputs still exist.
+    Stages depending on a failed stage are not run. Returns a dict of stage
+    name to status ("ran", "skipped", "failed" or "blocked").
+
+    With `jobs` above 1, every stage whose dependencies have finished is
+    started in a pool of worker processes. The output and status line of each
+    stage are still printed in dependency order, so the log is the same as a
+    sequential run apart from the timings.
+    """
+    state = load_state(state_path)
+    fingerprinter = Fingerprinter(state["files"])
+    order = topological_order(stages)
+    results, outcomes, lines = {}, {}, {}
+    pending, running = list(order), {}
+    printed = []
+    start = time.perf_counter()
+    pool = make_pool(resolve_jobs(jobs))
+
+    def flush():
+        # Print every finished stage whose predecessors in the order are printed too
+        while len(printed) < len(order) and order[len(printed)].name in results:
+            name = order[len(printed)].name
+            if name in outcomes:
+                replay(outcomes[name])
+            print(lines[name])
+            printed.append(name)
+
+    def complete(stage, fingerprint, outcome):
+        if outcome["error"] is None and stage.finish is not None:
+            try:
+                stage.finish(outcome["result"])
+            except Exception as e:
+                outcome["error"] = str(e) or type(e).__name__
+        outcomes[stage.name] = outcome
+        if outcome["error"] is not None:
+            results[stage.name] = "failed"
+            state["stages"].pop(stage.name, None)
+            lines[stage.name] = f"[failed] {stage.name}: {outcome['error']}"
+        else:
+            results[stage.name] = "ran"
+            state["stages"][stage.name] = fingerprint
+            lines[stage.name] = f"[ran] {stage.name} in {outcome['seconds']:.2f}s"
+
+    with pool or contextlib.nullcontext():
+        while pending or running:
+            for stage in list(pending):
+                if any(dep not in results for dep in stage.deps):
+                    continue
+                pending.remove(stage)
+
+                if any(results[dep] in ("failed", "blocked") for dep in stage.deps):
+                    results[stage.name] = "blocked"
+                    lines[stage.name] = f"[blocked] {stage.name}"
+                    continue
+
+                fingerprint = fingerprinter.stage(stage)
+                up_to_date = (
+                    not force
+                    and not stage.always_run
+                    and state["stages"].get(stage.name) == fingerprint
+                    and all(os.path.exists(path) for path in stage.outputs)
+                )
+                if up_to_date:
+                    results[stage.name] = "skipped"
+                    lines[stage.name] = f"[skipped] {stage.name}"
+                elif pool is None:
+                    complete(stage, fingerprint, call(stage.action))
+                else:
+                    running[pool.submit(call, stage.action, (), True)] = (stage, fingerprint)
+                flush()
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, fingerprint = running.pop(future)
+                    complete(stage, fingerprint, future.result())
+            flush()
+
+    if outcomes:
+        report_outcomes(outcomes, time.perf_counter() - start)
+
+    # Keep the file hashes for the next run, including outputs written just now
+    for stage in stages:
+        for path in stage.outputs:
+            fingerprinter.file_hash(path)
+    state["files"] = fingerprinter.current
+    save_state(state, state_path)
+    return results
+
+
+def _fetch(api_key):
+    failed = fetch_and_save_all(api_key, data_dir=raw_data_dir)
+    if failed:
+        raise ValueError(f"Failed to fetch: {', '.join(failed)}")
+
+
+def _validate(raw_path, indicator):
+    if not validate_csv(raw_path, indicator):
+        raise ValueError(f"Validation failed for {raw_path}")
+
+
+def _clean(indicator, raw_path, cleaned_path, streaming=False):
+    clean = clean_csv_streaming if streaming else clean_csv
+    if clean(raw_path, cleaned_path) is None:
+        raise ValueError(f"Cleaning failed for {raw_path}")
+    return {indicator: (last_data_date(cleaned_path), raw_history(raw_path))}
+
+
+def _merge(column_paths):
+    merge_monthly_columns(column_paths, merged_file_path)
+
+    registry = load_registry()
+    return {
+        indicator: last_data_date(os.path.join(cleaned_data_dir, registry[indicator].cleaned_file))
+        for indicator in column_paths
+    }
+
+
+def _record_watermarks(stage, dates):
+    manifest = load_manifest()
+    for indicator, date in dates.items():
+        set_watermark(manifest, indicator, stage, date)
+    save_manifest(manifest)
+
+
+def _record_cleaned(results):
+    # As in clean_data.py: the raw history lets the next incremental clean
+    # check that the cleaned rows were not revised, and the full re-clean
+    # invalidates the merged months until the merge stage records them again
+    manifest = load_manifest()
+    for indicator, (date, history) in results.items():
+        set_watermark(manifest, indicator, "cleaned", date)
+        set_history(manifest, indicator, history)
+        clear_watermark(manifest, indicator, "merged")
+    save_manifest(manifest)
+
+
+def build_stages(fetch=False, method="ffill", streaming=False):
+    """
+    Build the fetch -> validate -> clean -> resample/pyramid -> merge ->
+    publish graph for every indicator in the catalog.
+    """
+    os.makedirs(monthly_data_dir, exist_ok=True)
+    stages = []
+
+    if fetch:
+        api_key = os.getenv("FMP_API_KEY")
+        if not api_key:
+            raise ValueError("API key not found. Please set your FMP_API_KEY environment variable.")
+
+        stages.append(Stage("fetch", partial(_fetch, api_key), always_run=True))
+
+    column_paths = {}
+    cleaned_paths = []
+    level_paths = []
+    for indicator in load_registry().values():
+        name = indicator.display_name
+        raw_path = os.path.join(raw_data_dir, indicator.raw_file)
+        cleaned_path = os.path.join(cleaned_data_dir, indicator.cleaned_file)
+        monthly_path = os.path.join(monthly_data_dir, f"monthly_{indicator.raw_file}")
+        column_paths[name] = monthly_path
+        cleaned_paths.append(cleaned_path)
+        upstream = ["fetch"] if fetch else []
+
+        stages.append(Stage(
+            f"validate:{name}",
+            partial(_validate, raw_path, indicator),
+            inputs=[raw_path],
+            deps=upstream,
+        ))
+        stages.append(Stage(
+            f"clean:{name}",
+            partial(_clean, name, raw_path, cleaned_path, streaming),
+            inputs=[raw_path],
+            outputs=[cleaned_path],
+            params={"streaming": streaming},
+            deps=[f"validate:{name}"],
+            finish=_record_cleaned,
+        ))
+        stages.append(Stage(
+            f"resample:{name}",
+            partial(write_monthly_column, name, cleaned_path, monthly_path, method=method),
+            inputs=[cleaned_path],
+            outputs=[monthly_path],
+            params={"method": method},
+            deps=[f"clean:{name}"],
+        ))
+
+        # Daily/monthly/quarterly/annual aggregates read by the dashboard instead of resampling
+        paths = [pyramid_path(cleaned_path, level) for level in pyramid_levels(indicator.frequency)]
+        level_paths.extend(paths)
+        stages.append(Stage(
+            f"pyramid:{name}",
+            partial(build_pyramid, cleaned_path, indicator.frequency),
+            inputs=[cleaned_path],
+            outputs=paths,
+            params={"frequency": indicator.frequency},
+            deps=[f"clean:{name}"],
+        ))
+
+    stages.append(Stage(
+        "merge",
+        partial(_merge, column_paths),
+        inputs=list(column_paths.values()),
+        outputs=[merged_file_path],
+        params={"columns": list(column_paths)},
+        deps=[f"resample:{name}" for name in column_paths],
+        finish=partial(_record_watermarks, "merged"),
+    ))
+
+    # Memory-mapped copy of the cleaned tables shared by the dashboard processes
+    if DATASET_DIR:
+        stages.append(Stage(
+            "publish",
+            partial(publish_shared, cleaned_paths + [merged_file_path] + level_paths),
+            inputs=cleaned_paths + [merged_file_path] + level_paths,
+            outputs=[os.path.join(DATASET_DIR, POINTER_FILE)],
+            deps=["merge"] + [f"pyramid:{name}" for name in column_paths],
+        ))
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the data pipeline, rebuilding only what changed.")
+    parser.add_argument("--fetch", action="store_true", help="Fetch new observations from the FMP API first.")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage regardless of fingerprints.")
+    parser.add_argument("--method", default="ffill", choices=["ffill", "linear"], help="Monthly resampling method.")
+    parser.add_argument("--stream", action="store_true", help="Clean with the bounded-memory streaming cleaner.")
+    parser.add_argument("--jobs", type=int, help="Worker processes running independent stages in parallel (0 for one per CPU).")
+    parser.add_argument("--metrics-file", help="Write the stage timing metrics to this file in Prometheus text format.")
+    args = parser.parse_args()
+
+    stages = build_stages(fetch=args.fetch, method=args.method, streaming=args.stream)
+    results = run_stages(stages, force=args.force, jobs=args.jobs)
+
+    counts = {status: list(results.values()).count(status) for status in ("ran", "skipped", "failed", "blocked")}
+    print("\nPipeline finished: " + ", ".join(f"{count} {status}" for status, count in counts.items()))
+
+    if args.metrics_file:
+        write_metrics(args.metrics_file)
+        print(f"Metrics written to {args.metrics_file}")
+
+if __name__ == "__main__":
+    main()
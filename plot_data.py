@@ -1,15 +1,11 @@
 import os
 import pandas as pd
 import matplotlib.pyplot as plt
+from registry import raw_files
 
 # Directory containing the CSV files
 data_dir = "data/"
-indicators = {
-    "Real GDP (Gross Domestic Product)": "Real_GDP.csv",
-    "Inflation Rate": "Inflation_Rate.csv",
-    "Unemployment Rate": "Unemployment_Rate.csv",
-    "Federal Funds Rate": "Federal_Funds_Rate.csv",
-}
+indicators = raw_files()
 
 def plot_time_series(filepath, title):
     """
@@ -0,0 +1,112 @@
+import os
+import pandas as pd
+from data_loader import load_derived, load_table, read_range, write_columnar
+
+# Levels from finest to coarsest, with the resample rule of their buckets.
+# Buckets are labelled with their last day, as resample() does.
+LEVELS = {"daily": "D", "monthly": "ME", "quarterly": "QE", "annual": "YE"}
+
+# Aggregates stored for every bucket. Buckets without observations inside a
+# series' range are kept, with a count and sum of 0 and NaN for the others.
+AGGREGATES = ["mean", "last", "sum", "min", "max", "count"]
+
+# Directory, next to the cleaned files, holding the precomputed levels
+PYRAMID_SUBDIR = "pyramid"
+
+
+def pyramid_path(cleaned_path, level):
+    """
+    Return the path of the stored level of a cleaned data file.
+    """
+    directory, filename = os.path.split(cleaned_path)
+    return os.path.join(directory, PYRAMID_SUBDIR, f"{level}_{filename}")
+
+
+def pyramid_levels(frequency):
+    """
+    Return the levels worth storing for a series of the given frequency:
+    its own and every coarser one.
+    """
+    levels = list(LEVELS)
+    return levels[levels.index(frequency):] if frequency in levels else levels
+
+
+def aggregate_level(series, level):
+    """
+    Aggregate a date-indexed series into the buckets of a level, with one
+    column per aggregate. Missing values are ignored.
+    """
+    return series.dropna().resample(LEVELS[level]).agg(AGGREGATES).rename_axis("date")
+
+
+def build_pyramid(cleaned_path, frequency):
+    """
+    Compute and store every level of a cleaned data file worth storing for
+    its frequency, each as a CSV with a Parquet copy. Returns the paths.
+    """
+    series = read_range(cleaned_path, columns=["value"])["value"]
+    paths = []
+    for level in pyramid_levels(frequency):
+        save_path = pyramid_path(cleaned_path, level)
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        df = aggregate_level(series, level).reset_index()
+        df.to_csv(save_path, index=False)
+        write_columnar(df, save_path)
+        paths.append(save_path)
+    print(f"Pyramid of {cleaned_path} saved ({', '.join(pyramid_levels(frequency))})")
+    return paths
+
+
+def load_level(cleaned_path, level):
+    """
+    Return one level of a cleaned data file as a DataFrame of aggregates
+    indexed by bucket end.
+
+    The stored level is read when it is at least as recent as the cleaned
+    file. Otherwise (a level finer than the series, or a file refreshed
+    outside the pipeline) the level is computed once per version of the file.
+    """
+    stored_path = pyramid_path(cleaned_path, level)
+    if os.path.exists(stored_path) and os.stat(stored_path).st_mtime_ns >= os.stat(cleaned_path).st_mtime_ns:
+        return load_table(stored_path)
+    return load_derived(cleaned_path, f"pyramid:{level}", lambda data: aggregate_level(data["value"], level))
+
+
+def _bucket_end(date, offset):
+    return offset.rollforward(date.normalize())
+
+
+def resample_range(cleaned_path, level, start=None, end=None, how="mean"):
+    """
+    Return the observations between start and end (inclusive) aggregated to
+    a level with `how`, as a DataFrame with a 'value' column. The result is
+    the same as `data.loc[start:end].resample(rule).agg(how)`.
+
+    Buckets entirely inside the range come from the pyramid. Only the first
+    and last buckets, when the range cuts through them, are aggregated from
+    the observations, so the work does not grow with the range length.
+    """
+    rule = LEVELS[level]
+    data = load_table(cleaned_path)["value"]
+    dates = data.index
+    i = 0 if start is None else int(dates.searchsorted(pd.Timestamp(start), side="left"))
+    j = len(dates) if end is None else int(dates.searchsorted(pd.Timestamp(end), side="right"))
+    rows = data.iloc[i:j]
+    if rows.empty:
+        return rows.resample(rule).agg(how).to_frame("value")
+
+    offset = pd.tseries.frequencies.to_offset(rule)
+    first_end, last_end = _bucket_end(dates[i], offset), _bucket_end(dates[j - 1], offset)
+    first_cut = i > 0 and _bucket_end(dates[i - 1], offset) == first_end
+    last_cut = j < len(dates) and _bucket_end(dates[j], offset) == last_end
+    if first_end == last_end and (first_cut or last_cut):
+        return rows.resample(rule).agg(how).to_frame("value")
+
+    values = load_level(cleaned_path, level)[how].loc[first_end:last_end].astype(float)
+    if first_cut:
+        head = rows.iloc[:int(rows.index.searchsorted(first_end + pd.Timedelta(days=1), side="left"))]
+        values.iloc[0] = head.resample(rule).agg(how).iloc[0]
+    if last_cut:
+        tail = rows.iloc[int(rows.index.searchsorted(last_end - offset + pd.Timedelta(days=1), side="left")):]
+        values.iloc[-1] = tail.resample(rule).agg(how).iloc[-1]
+    return values.to_frame("value")
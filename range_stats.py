@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from data_loader import load_derived
+
+
+class RangeStats:
+    """
+    Precomputed index answering most-recent, max, min, mean and standard
+    deviation queries over any date range of a series in constant time
+    (after a binary search for the range bounds).
+
+    Max/min and their dates come from sparse tables of argmax/argmin over
+    power-of-two windows; mean and variance come from prefix sums of the
+    values and their squares. Building takes O(n log n) time and memory.
+    """
+
+    def __init__(self, series):
+        series = series.dropna()
+        self.dates = series.index.to_numpy(dtype="datetime64[ns]")
+        self.values = series.to_numpy(dtype=float)
+        n = len(self.values)
+
+        # Prefix sums of values shifted by their mean, which keeps the
+        # variance computation numerically stable
+        self.shift = float(self.values.mean()) if n else 0.0
+        shifted = self.values - self.shift
+        self.prefix_sum = np.concatenate(([0.0], np.cumsum(shifted)))
+        self.prefix_sq = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+
+        # Sparse tables: level k holds the position of the max/min of values[i:i + 2**k]
+        self.argmax_table = [np.arange(n, dtype=np.int64)]
+        self.argmin_table = [np.arange(n, dtype=np.int64)]
+        width = 1
+        while 2 * width <= n:
+            self.argmax_table.append(self._combine(self.argmax_table[-1], width, np.greater_equal))
+            self.argmin_table.append(self._combine(self.argmin_table[-1], width, np.less_equal))
+            width *= 2
+
+    def _combine(self, previous, width, prefer_left):
+        # Ties keep the left position, so results match pandas' idxmax/idxmin
+        left = previous[:len(previous) - width]
+        right = previous[width:]
+        return np.where(prefer_left(self.values[left], self.values[right]), left, right)
+
+    def _bounds(self, start, end):
+        """
+        Positions [i, j] of the observations between start and end, inclusive.
+        """
+        i = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side="left"))
+        j = len(self.dates) - 1 if end is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side="right")) - 1
+        return i, j
+
+    def _query_table(self, table, i, j, prefer_left):
+        level = (j - i + 1).bit_length() - 1
+        left, right = table[level][i], table[level][j - (1 << level) + 1]
+        return left if prefer_left(self.values[left], self.values[right]) else right
+
+    def query(self, start=None, end=None):
+        """
+        Return the statistics of the observations between start and end
+        (inclusive) as a dict, or None when the range holds no observation.
+        """
+        i, j = self._bounds(start, end)
+        if j < i:
+            return None
+
+        count = j - i + 1
+        total = self.prefix_sum[j + 1] - self.prefix_sum[i]
+        total_sq = self.prefix_sq[j + 1] - self.prefix_sq[i]
+        mean = total / count
+        variance = (total_sq - total * mean) / (count - 1) if count > 1 else np.nan
+        max_pos = self._query_table(self.argmax_table, i, j, np.greater_equal)
+        min_pos = self._query_table(self.argmin_table, i, j, np.less_equal)
+
+        return {
+            "count": count,
+            "most_recent_date": pd.Timestamp(self.dates[j]),
+            "most_recent_value": self.values[j],
+            "max_date": pd.Timestamp(self.dates[max_pos]),
+            "max_value": self.values[max_pos],
+            "min_date": pd.Timestamp(self.dates[min_pos]),
+            "min_value": self.values[min_pos],
+            "mean": mean + self.shift,
+            "std": float(np.sqrt(max(variance, 0.0))) if count > 1 else np.nan,
+        }
+
+
+def load_range_stats(filepath, column="value"):
+    """
+    Return the RangeStats index of a column of a cleaned data file, built once
+    per version of the file and shared across reruns and sessions.
+    """
+    return load_derived(filepath, f"range_stats:{column}", lambda data: RangeStats(data[column]))
@@ -0,0 +1,99 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+# Catalog declaring every indicator, next to this module
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "indicators.toml")
+
+FREQUENCIES = ("daily", "monthly", "quarterly")
+AGGREGATIONS = ("mean", "last", "sum", "min", "max")
+
+
+@dataclass(frozen=True)
+class Indicator:
+    """
+    A single series declared in the indicator catalog.
+    """
+
+    display_name: str
+    name: str
+    frequency: str
+    aggregation: str
+    file: str
+    min_value: float = None
+    max_value: float = None
+
+    @property
+    def raw_file(self):
+        return self.file
+
+    @property
+    def cleaned_file(self):
+        return f"cleaned_{self.file}"
+
+
+def _parse_entry(entry):
+    """
+    Validate one catalog entry and build its Indicator.
+    """
+    for key in ("display_name", "name", "frequency", "aggregation"):
+        if key not in entry:
+            raise ValueError(f"Indicator entry {entry} is missing '{key}'.")
+    if entry["frequency"] not in FREQUENCIES:
+        raise ValueError(f"Unsupported frequency for {entry['display_name']}: {entry['frequency']}")
+    if entry["aggregation"] not in AGGREGATIONS:
+        raise ValueError(f"Unsupported aggregation for {entry['display_name']}: {entry['aggregation']}")
+
+    return Indicator(
+        display_name=entry["display_name"],
+        name=entry["name"],
+        frequency=entry["frequency"],
+        aggregation=entry["aggregation"],
+        file=entry.get("file", f"{entry['display_name'].replace(' ', '_')}.csv"),
+        min_value=entry.get("min_value"),
+        max_value=entry.get("max_value"),
+    )
+
+
+@lru_cache(maxsize=None)
+def load_registry(path=REGISTRY_PATH):
+    """
+    Load the indicator catalog once per process, keyed by display name in
+    catalog order.
+    """
+    with open(path, "rb") as f:
+        catalog = tomllib.load(f)
+
+    registry = {}
+    for entry in catalog.get("indicator", []):
+        indicator = _parse_entry(entry)
+        if indicator.display_name in registry:
+            raise ValueError(f"Duplicate indicator in catalog: {indicator.display_name}")
+        registry[indicator.display_name] = indicator
+    return registry
+
+
+def raw_files(path=REGISTRY_PATH):
+    """
+    Map each indicator's display name to its raw file name.
+    """
+    return {name: indicator.raw_file for name, indicator in load_registry(path).items()}
+
+
+def cleaned_files(path=REGISTRY_PATH):
+    """
+    Map each indicator's display name to its cleaned file name.
+    """
+    return {name: indicator.cleaned_file for name, indicator in load_registry(path).items()}
+
+
+def fmp_names(path=REGISTRY_PATH):
+    """
+    Map each indicator's display name to its FMP 'name' parameter.
+    """
+    return {name: indicator.name for name, indicator in load_registry(path).items()}
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Root of the published datasets; set SHARED_DATASET_DIR to an empty string to disable
+DATASET_DIR = os.getenv("SHARED_DATASET_DIR", "cleaned_data/shared/")
+
+# File in DATASET_DIR naming the current version directory
+POINTER_FILE = "CURRENT"
+
+# Older versions kept next to the current one for processes still mapping them
+KEEP_VERSIONS = 2
+
+# Tables are named by their source path relative to the project root
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# The dataset opened by this process, reloaded when the pointer file changes
+_current = None
+_lock = threading.Lock()
+
+
+class SharedDataset:
+    """
+    A published, immutable version of the cleaned tables. Every table is
+    stored as a datetime64 date array and a column-major float64 value
+    matrix in .npy files, which every process maps read-only, so the pages
+    are shared through the OS page cache instead of copied per process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json")) as f:
+            self.tables = json.load(f)["tables"]
+        # Whether the hash of a source file matched its table, by (path, mtime, size)
+        self._verified = {}
+
+    def find(self, filepath):
+        """
+        Return the name of the table published from the given CSV file, or
+        None when there is none or the file changed since.
+        """
+        name = table_name(filepath)
+        table = self.tables.get(name)
+        if table is None:
+            return None
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) == (table["mtime"], table["size"]):
+            return name
+
+        # Touched but possibly unchanged (e.g. by a checkout); compare the contents
+        # once per version of the file, remembering mismatches too
+        fingerprint = (name, stat.st_mtime_ns, stat.st_size)
+        if fingerprint not in self._verified:
+            self._verified[fingerprint] = stat.st_size == table["size"] and file_hash(filepath) == table["hash"]
+        return name if self._verified[fingerprint] else None
+
+    def load(self, name):
+        """
+        Map a table as a read-only, date-indexed DataFrame without copying it.
+        """
+        table = self.tables[name]
+        dates = np.load(os.path.join(self.path, table["dates"]), mmap_mode="r")
+        values = np.load(os.path.join(self.path, table["values"]), mmap_mode="r")
+        index = pd.DatetimeIndex(dates, name="date", copy=False)
+        return pd.DataFrame(values, index=index, columns=table["columns"], copy=False)
+
+
+def file_hash(filepath):
+    """
+    Compute a SHA-1 digest of the file contents.
+    """
+    digest = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def table_name(filepath):
+    """
+    Return the name of the table published from a file: its path relative
+    to the project root, so that files with the same name in different
+    directories never share a table.
+    """
+    path = os.path.abspath(filepath)
+    try:
+        return os.path.relpath(path, PROJECT_ROOT).replace(os.sep, "/")
+    except ValueError:  # On another drive (Windows)
+        return path
+
+
+def _pointer_path(dataset_dir):
+    return os.path.join(dataset_dir, POINTER_FILE)
+
+
+def current_dataset(dataset_dir=None):
+    """
+    Return the currently published dataset, or None. The pointer file is
+    checked on every call, so a new publication is picked up by running
+    processes without a restart.
+    """
+    global _current
+    dataset_dir = DATASET_DIR if dataset_dir is None else dataset_dir
+    if not dataset_dir:
+        return None
+    try:
+        with open(_pointer_path(dataset_dir)) as f:
+            path = os.path.join(dataset_dir, f.read().strip())
+    except OSError:
+        return None
+
+    with _lock:
+        if _current is None or _current.path != path:
+            try:
+                _current = SharedDataset(path)
+            except (OSError, ValueError, KeyError):
+                return None
+        return _current
+
+
+def find_table(filepath, dataset_dir=None):
+    """
+    Return (dataset, table name) for a cleaned CSV file with an up-to-date
+    published copy, or None.
+    """
+    dataset = current_dataset(dataset_dir)
+    if dataset is None:
+        return None
+    name = dataset.find(filepath)
+    return (dataset, name) if name is not None else None
+
+
+def publish_dataset(tables, dataset_dir=None):
+    """
+    Publish {CSV path: date-indexed DataFrame} as a new immutable version
+    and point DATASET_DIR at it. Tables with non-numeric columns are
+    skipped. Publishing unchanged sources reuses the existing version.
+    Returns the version directory.
+    """
+    dataset_dir = DATASET_DIR if dataset_dir is None else dataset_dir
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    entries = {}
+    for filepath, df in tables.items():
+        if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+            print(f"Skipping {filepath}: only numeric tables can be shared.")
+            continue
+        stat = os.stat(filepath)
+        entries[table_name(filepath)] = (df, {
+            "columns": list(df.columns),
+            "rows": len(df),
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": file_hash(filepath),
+        })
+
+    # The version is named after the contents of its sources
+    digest = hashlib.sha1(json.dumps(sorted((name, meta["hash"]) for name, (_, meta) in entries.items())).encode())
+    version = digest.hexdigest()[:16]
+    version_path = os.path.join(dataset_dir, version)
+
+    index = {}
+    for i, (name, (_, meta)) in enumerate(sorted(entries.items())):
+        meta["dates"] = f"{i:04d}.dates.npy"
+        meta["values"] = f"{i:04d}.values.npy"
+        index[name] = meta
+
+    if not os.path.exists(os.path.join(version_path, "index.json")):
+        # Write into a temporary directory and rename it, so readers never see a partial version
+        tmp_path = f"{version_path}.tmp{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name, (df, _) in entries.items():
+            dates = np.asarray(df.index.values, dtype="datetime64[ns]")
+            values = np.asfortranarray(df.to_numpy(dtype=np.float64))
+            np.save(os.path.join(tmp_path, index[name]["dates"]), dates)
+            np.save(os.path.join(tmp_path, index[name]["values"]), values)
+        with open(os.path.join(tmp_path, "index.json"), "w") as f:
+            json.dump({"created": time.time(), "tables": index}, f, indent=2, sort_keys=True)
+        shutil.rmtree(version_path, ignore_errors=True)
+        os.replace(tmp_path, version_path)
+    else:
+        # Same contents; record the current fingerprints of the source files
+        index_path = os.path.join(version_path, "index.json")
+        with open(index_path) as f:
+            published = json.load(f)
+        published["tables"] = index
+        with open(f"{index_path}.tmp", "w") as f:
+            json.dump(published, f, indent=2, sort_keys=True)
+        os.replace(f"{index_path}.tmp", index_path)
+
+    pointer = _pointer_path(dataset_dir)
+    with open(f"{pointer}.tmp", "w") as f:
+        f.write(version + "\n")
+    os.replace(f"{pointer}.tmp", pointer)
+
+    _remove_old_versions(dataset_dir, version)
+    return version_path
+
+
+def _remove_old_versions(dataset_dir, current, keep=KEEP_VERSIONS):
+    """
+    Delete all but the `keep` newest versions besides the current one.
+    Processes still mapping a deleted version keep reading it until they
+    switch to the current one.
+    """
+    versions = [
+        entry for entry in os.scandir(dataset_dir)
+        if entry.is_dir() and entry.name != current and ".tmp" not in entry.name
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
@@ -1,8 +1,8 @@
 import os
 from openai import OpenAI
 
-# Initialize the client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Initialize the client (OPENAI_BASE_URL can point it at a compatible server such as mock_openai_server.py)
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"))
 
 try:
     # Make a simple test call using the new interface
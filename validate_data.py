@@ -1,51 +1,414 @@
+import argparse
+import contextlib
+import json
 import os
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
+from instrumentation import span
+from parallel import report_outcomes, run_tasks
+from registry import load_registry
 
 # Directory containing CSV files
 data_dir = "data/"
-indicators = {
-    "Real GDP": "Real_GDP.csv",
-    "Inflation Rate": "Inflation_Rate.csv",
-    "Unemployment Rate": "Unemployment_Rate.csv",
-    "Federal Funds Rate": "Federal_Funds_Rate.csv",
+indicators = load_registry()
+
+# Rows parsed at a time; memory use depends on this, not on the file size
+CHUNK_SIZE = 100_000
+
+# Largest allowed gap in days between consecutive observations per declared frequency
+# (daily FMP series skip weekends and holidays)
+MAX_GAP_DAYS = {"daily": 7, "monthly": 31, "quarterly": 92}
+
+# A change in value is a spike when it lies this many standard deviations
+# from the mean of the preceding SPIKE_WINDOW changes
+SPIKE_ZSCORE = 8.0
+SPIKE_WINDOW = 60
+
+# Findings listed per rule in the report; the rest are only counted
+MAX_EXAMPLES = 10
+
+# Day numbers covering every date pandas can represent, for the duplicate bitmap
+_FIRST_DAY = np.datetime64(pd.Timestamp.min.date(), "D").astype(np.int64)
+_LAST_DAY = np.datetime64(pd.Timestamp.max.date(), "D").astype(np.int64)
+
+
+class Rule:
+    """
+    A check evaluated chunk by chunk on the parsed rows. Subclasses count
+    their findings in check() and keep only bounded state between chunks.
+    Rules with severity "error" make the file invalid.
+    """
+
+    name = None
+    severity = "warning"
+
+    def __init__(self, indicator=None):
+        self.indicator = indicator
+        self.count = 0
+        self.examples = []
+
+    def applies(self):
+        return True
+
+    def check(self, chunk):
+        raise NotImplementedError
+
+    def add(self, count, examples):
+        self.count += int(count)
+        room = MAX_EXAMPLES - len(self.examples)
+        if room > 0:
+            self.examples.extend(examples[:room])
+
+    def add_rows(self, chunk, mask):
+        """
+        Count the rows selected by a boolean mask over the chunk.
+        """
+        self.add(mask.sum(), _examples(chunk, mask) if len(self.examples) < MAX_EXAMPLES else [])
+
+    def result(self):
+        return {"rule": self.name, "severity": self.severity, "count": self.count, "examples": self.examples}
+
+
+def _examples(chunk, mask, columns=("row", "date_text", "value")):
+    """
+    Describe the first MAX_EXAMPLES rows of the chunk selected by `mask`.
+    """
+    selected = np.flatnonzero(mask)[:MAX_EXAMPLES]
+    if len(selected) == 0:
+        return []
+    rows = chunk.iloc[selected][list(columns)]
+    return [
+        {"row": int(row), "date": date, "value": None if pd.isna(value) else float(value)}
+        for row, date, value in rows.itertuples(index=False)
+    ]
+
+
+class SchemaRule(Rule):
+    """
+    Every row has a parseable date and a numeric (or empty) value.
+    """
+
+    name = "schema"
+    severity = "error"
+
+    def check(self, chunk):
+        bad_dates = chunk["date"].isna().to_numpy()
+        bad_values = (chunk["value"].isna() & ~chunk["value_missing"]).to_numpy()
+        bad = bad_dates | bad_values
+        self.add_rows(chunk, bad)
+
+
+class MissingValuesRule(Rule):
+    """
+    Rows with an empty value, which the cleaning step drops.
+    """
+
+    name = "missing_values"
+
+    def check(self, chunk):
+        missing = chunk["value_missing"].to_numpy()
+        self.add_rows(chunk, missing)
+
+
+class DuplicateDatesRule(Rule):
+    """
+    Calendar days occurring more than once anywhere in the file, tracked
+    with a fixed-size bitmap of every representable day.
+    """
+
+    name = "duplicate_dates"
+
+    def __init__(self, indicator=None):
+        super().__init__(indicator)
+        self.seen = np.zeros(_LAST_DAY - _FIRST_DAY + 1, dtype=bool)
+
+    def check(self, chunk):
+        valid = chunk["date"].notna().to_numpy()
+        days = chunk["date"].to_numpy()[valid].astype("datetime64[D]").astype(np.int64) - _FIRST_DAY
+        duplicate = self.seen[days] | pd.Series(days).duplicated().to_numpy()
+        self.seen[days] = True
+        mask = np.zeros(len(chunk), dtype=bool)
+        mask[np.flatnonzero(valid)[duplicate]] = True
+        self.add_rows(chunk, mask)
+
+
+class DateOrderRule(Rule):
+    """
+    Dates run in one direction through the file (FMP files are newest first).
+    The direction is taken from the first two distinct dates.
+    """
+
+    name = "date_order"
+
+    def __init__(self, indicator=None):
+        super().__init__(indicator)
+        self.previous = None
+        self.direction = 0
+
+    def check(self, chunk):
+        valid = chunk["date"].notna().to_numpy()
+        dates = chunk["date"].to_numpy()[valid].astype(np.int64)
+        if len(dates) == 0:
+            return
+        if self.previous is not None:
+            dates_with_previous = np.concatenate(([self.previous], dates))
+        else:
+            dates_with_previous = dates
+        # Compare instead of subtracting; differences of far-apart dates overflow int64
+        earlier, later = dates_with_previous[:-1], dates_with_previous[1:]
+        steps = (later > earlier).astype(np.int64) - (later < earlier).astype(np.int64)
+        if self.direction == 0 and np.any(steps != 0):
+            self.direction = steps[steps != 0][0]
+        reversed_steps = steps == -self.direction if self.direction else np.zeros(len(steps), dtype=bool)
+        # Align the steps with the rows they end at
+        if self.previous is None:
+            reversed_steps = np.concatenate(([False], reversed_steps))
+        mask = np.zeros(len(chunk), dtype=bool)
+        mask[np.flatnonzero(valid)[reversed_steps]] = True
+        self.add_rows(chunk, mask)
+        self.previous = dates[-1]
+
+
+class GapRule(Rule):
+    """
+    Consecutive observations further apart than the indicator's declared
+    frequency allows.
+    """
+
+    name = "frequency_gaps"
+
+    def __init__(self, indicator=None):
+        super().__init__(indicator)
+        self.previous = None
+
+    def applies(self):
+        return self.indicator is not None
+
+    def check(self, chunk):
+        dates = chunk["date"].dropna().to_numpy().astype("datetime64[D]")
+        if len(dates) == 0:
+            return
+        if self.previous is not None:
+            dates = np.concatenate(([self.previous], dates))
+        self.previous = dates[-1]
+        gaps = np.abs(np.diff(dates).astype(np.int64))
+        over = np.flatnonzero(gaps > MAX_GAP_DAYS[self.indicator.frequency])
+        examples = [
+            {"from": str(min(dates[i], dates[i + 1])), "to": str(max(dates[i], dates[i + 1])), "days": int(gaps[i])}
+            for i in over[:MAX_EXAMPLES]
+        ]
+        self.add(len(over), examples)
+
+
+class ValueRangeRule(Rule):
+    """
+    Values outside the min_value / max_value bounds declared in the catalog.
+    """
+
+    name = "value_range"
+    severity = "error"
+
+    def applies(self):
+        return self.indicator is not None and (self.indicator.min_value is not None or self.indicator.max_value is not None)
+
+    def check(self, chunk):
+        values = chunk["value"]
+        outside = np.zeros(len(chunk), dtype=bool)
+        if self.indicator.min_value is not None:
+            outside |= (values < self.indicator.min_value).to_numpy()
+        if self.indicator.max_value is not None:
+            outside |= (values > self.indicator.max_value).to_numpy()
+        self.add_rows(chunk, outside)
+
+
+class SpikeRule(Rule):
+    """
+    Changes in value that lie more than SPIKE_ZSCORE rolling standard
+    deviations from the mean of the preceding SPIKE_WINDOW changes. The last
+    window of values is carried over to the next chunk.
+    """
+
+    name = "spikes"
+
+    def __init__(self, indicator=None):
+        super().__init__(indicator)
+        self.tail = np.empty(0)
+
+    def check(self, chunk):
+        observed = np.flatnonzero(chunk["value"].notna().to_numpy())
+        carried = len(self.tail)
+        values = np.concatenate((self.tail, chunk["value"].to_numpy()[observed]))
+        changes = pd.Series(values).diff()
+        window = changes.rolling(SPIKE_WINDOW, min_periods=SPIKE_WINDOW)
+        mean, std = window.mean().shift(1).to_numpy(), window.std().shift(1).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            zscore = (changes.to_numpy() - mean) / np.where(std > 0, std, np.nan)
+        spike = np.abs(zscore[carried:]) > SPIKE_ZSCORE
+
+        mask = np.zeros(len(chunk), dtype=bool)
+        mask[observed[spike]] = True
+        examples = _examples(chunk, mask) if len(self.examples) < MAX_EXAMPLES else []
+        for example, score in zip(examples, zscore[carried:][spike]):
+            example["zscore"] = round(float(score), 1)
+        self.add(spike.sum(), examples)
+        self.tail = values[-(SPIKE_WINDOW + 1):]
+
+
+# Rules in report order, by name
+RULES = {
+    rule.name: rule
+    for rule in (SchemaRule, MissingValuesRule, DuplicateDatesRule, DateOrderRule, GapRule, ValueRangeRule, SpikeRule)
 }
 
-def validate_csv(filepath):
+
+def _parse_chunk(chunk, first_row):
     """
-    Validate a CSV file by checking for missing values and proper formatting of the date column.
+    Parse a chunk of raw rows into dates, numeric values and their line
+    numbers in the file, keeping the original date text for the report.
     """
-    print(f"Validating file: {filepath}...")
+    values = pd.to_numeric(chunk["value"], errors="coerce")
+    return pd.DataFrame({
+        "row": np.arange(first_row, first_row + len(chunk)),
+        "date_text": chunk["date"].to_numpy(),
+        "date": pd.to_datetime(chunk["date"], format="ISO8601", errors="coerce").to_numpy(),
+        "value": values.to_numpy(dtype=float),
+        "value_missing": chunk["value"].isna().to_numpy(),
+    })
+
+
+def validate_file(filepath, indicator=None, rules=None, chunksize=CHUNK_SIZE):
+    """
+    Validate a raw `date,value` file in chunks of `chunksize` rows and return
+    a JSON-serializable report. `indicator` (a registry entry) enables the
+    frequency and value range rules; `rules` restricts the rule names run.
+    The file is valid when no error-severity rule has findings.
+    """
+    start = time.perf_counter()
+    report = {
+        "file": filepath,
+        "indicator": indicator.display_name if indicator is not None else None,
+        "bytes": os.path.getsize(filepath),
+        "rows": 0,
+        "first_date": None,
+        "last_date": None,
+    }
+
     try:
-        # Load the data
-        df = pd.read_csv(filepath)
+        columns = list(pd.read_csv(filepath, nrows=0).columns)
     except Exception as e:
-        print(f"Error loading file: {e}")
-        return
-
-    # Check for missing values
-    missing_values = df.isnull().sum()
-    print("Missing values:")
-    print(missing_values)
-
-    # Ensure 'date' column exists and is properly formatted
-    if "date" in df.columns:
-        try:
-            df["date"] = pd.to_datetime(df["date"])
-            print("Date column is present and properly formatted.")
-        except Exception as e:
-            print(f"Error in date column formatting: {e}")
+        columns, error = [], f"unreadable file: {e}"
     else:
-        print("Date column is missing!")
+        missing = [column for column in ("date", "value") if column not in columns]
+        error = f"missing column(s): {', '.join(missing)}" if missing else None
+
+    if error is not None:
+        report.update(valid=False, seconds=round(time.perf_counter() - start, 4), rules=[
+            {"rule": "schema", "severity": "error", "count": 1, "examples": [{"message": error}]}
+        ])
+        return report
+
+    active = [RULES[name](indicator) for name in (rules or RULES)]
+    active = [rule for rule in active if rule.applies()]
+    first, last = None, None
+    # Header is line 1, so the first data row is line 2
+    first_row = 2
+    for raw in pd.read_csv(filepath, usecols=["date", "value"], dtype={"date": str}, chunksize=chunksize):
+        chunk = _parse_chunk(raw, first_row)
+        first_row += len(chunk)
+        for rule in active:
+            rule.check(chunk)
+
+        dates = chunk["date"].dropna()
+        if len(dates):
+            first = dates.min() if first is None else min(first, dates.min())
+            last = dates.max() if last is None else max(last, dates.max())
+
+    report["rows"] = first_row - 2
+    report["first_date"] = str(first.date()) if first is not None else None
+    report["last_date"] = str(last.date()) if last is not None else None
+    report["rules"] = [rule.result() for rule in active]
+    report["valid"] = not any(rule.count for rule in active if rule.severity == "error")
+    report["seconds"] = round(time.perf_counter() - start, 4)
+    return report
+
+
+def validate_and_print(filepath, indicator=None, rules=None, chunksize=CHUNK_SIZE):
+    """
+    Validate a file with the streaming rule engine, print a summary of the
+    findings and return the report.
+    """
+    with span("pipeline.validate", file=filepath) as current_span:
+        print(f"Validating file: {filepath}...")
+        report = validate_file(filepath, indicator, rules, chunksize)
+        current_span.set(rows=report["rows"], bytes=report["bytes"], valid=report["valid"])
+
+        print(f"{report['rows']} rows from {report['first_date']} to {report['last_date']}")
+        for result in report["rules"]:
+            if result["count"]:
+                print(f"  [{result['severity']}] {result['rule']}: {result['count']}")
+        print("Valid." if report["valid"] else "Invalid!")
+        print("-" * 50)
+        return report
+
+
+def validate_csv(filepath, indicator=None, rules=None, chunksize=CHUNK_SIZE):
+    """
+    Validate a CSV file and print a summary.
+    Returns False if the file could not be read or an error rule failed.
+    """
+    return validate_and_print(filepath, indicator, rules, chunksize)["valid"]
 
-    print("-" * 50)
 
 def main():
-    for indicator, filename in indicators.items():
-        filepath = os.path.join(data_dir, filename)
-        if os.path.exists(filepath):
-            validate_csv(filepath)
+    parser = argparse.ArgumentParser(description="Validate raw indicator files and write a JSON report.")
+    parser.add_argument("files", nargs="*", help="Files to validate (default: every file in the catalog).")
+    parser.add_argument("--report", help="Write the JSON report to this file ('-' for standard output).")
+    parser.add_argument("--rules", nargs="+", choices=list(RULES), help="Rules to run (default: all).")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="Rows parsed at a time.")
+    parser.add_argument("--jobs", type=int, help="Worker processes validating files in parallel (0 for one per CPU).")
+    args = parser.parse_args()
+
+    by_file = {indicator.raw_file: indicator for indicator in indicators.values()}
+    if args.files:
+        targets = [(path, by_file.get(os.path.basename(path))) for path in args.files]
+    else:
+        targets = [(os.path.join(data_dir, indicator.raw_file), indicator) for indicator in indicators.values()]
+
+    # With the report on standard output, the progress messages go to standard error
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr) if args.report == "-" else contextlib.nullcontext():
+        tasks = {}
+        for filepath, indicator in targets:
+            if not os.path.exists(filepath):
+                print(f"File not found: {filepath}")
+                continue
+            tasks[filepath] = (validate_and_print, (filepath, indicator, args.rules, args.chunksize))
+
+        start = time.perf_counter()
+        outcomes = run_tasks(tasks, args.jobs)
+        failures = report_outcomes(outcomes, time.perf_counter() - start)
+    reports = [outcome["result"] for outcome in outcomes.values() if outcome["result"] is not None]
+
+    if args.report:
+        output = {
+            "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "valid": not failures and all(report["valid"] for report in reports),
+            "files": reports,
+            "errors": failures,
+        }
+        if args.report == "-":
+            json.dump(output, stdout, indent=2)
+            print(file=stdout)
         else:
-            print(f"File not found: {filepath}")
+            with open(args.report, "w") as f:
+                json.dump(output, f, indent=2)
+            print(f"Report written to {args.report}")
+
+    if failures or not all(report["valid"] for report in reports):
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()